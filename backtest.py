@@ -0,0 +1,73 @@
+# -*- encoding: UTF-8 -*-
+
+import numpy as np
+import pandas as pd
+
+COMMISSION_RATE = 0.001  # 佣金率0.1%
+INITIAL_CAPITAL = 20000  # 初始资金
+TRADING_DAYS = 252
+
+
+# 单只股票的信号回测：buy为买入信号、sell为卖出信号（布尔数组），均以当日收盘价成交，空仓时全仓买入，持仓时全部卖出。
+# 仓位只在有信号的K线上才可能变化，所以只对这些K线逐根递推，资金、市值、净值、收益率和回撤都由数组运算得到。
+# 返回(逐日结果DataFrame, 交易记录)，与tests/backtest_chandelier_exit原来逐行回测的结果一致
+def run(close, buy, sell, index=None, initial_capital=INITIAL_CAPITAL, commission_rate=COMMISSION_RATE):
+    close = np.asarray(close, dtype=np.float64)
+    buy = np.asarray(buy, dtype=bool)
+    sell = np.asarray(sell, dtype=bool)
+    index = pd.RangeIndex(len(close)) if index is None else index
+
+    # 有信号的K线上的资金和持股数，其余K线沿用之前的值；第一根K线不交易
+    cash = np.full(len(close), np.nan)
+    position = np.full(len(close), np.nan)
+    cash[:1] = initial_capital
+    position[:1] = 0
+
+    trades = []
+    capital = initial_capital
+    shares = 0
+    buy_price = 0
+    buy_date = None
+    for i in np.flatnonzero(buy[1:] | sell[1:]) + 1:
+        price = close[i]
+        if buy[i] and shares == 0:
+            buy_price = price
+            buy_date = index[i]
+            shares = capital // (price * (1 + commission_rate))
+            capital -= shares * price * (1 + commission_rate)
+        elif sell[i] and shares > 0:
+            revenue = shares * price * (1 - commission_rate)
+            capital += revenue
+            trades.append({
+                '买入日期': buy_date,
+                '买入价格': buy_price,
+                '卖出日期': index[i],
+                '卖出价格': price,
+                '收益率': (price / buy_price) - 1,
+                '盈利金额': revenue - (shares * buy_price * (1 + commission_rate)),
+            })
+            shares = 0
+            buy_price = 0
+            buy_date = None
+        cash[i] = capital
+        position[i] = shares
+
+    result = pd.DataFrame({'Position': position, 'Cash': cash}, index=index).ffill()
+    result['Holdings'] = result['Position'].values * close
+    result.iloc[0, result.columns.get_loc('Holdings')] = 0
+    result['Portfolio'] = result['Cash'] + result['Holdings']
+
+    result['Returns'] = result['Portfolio'].pct_change()
+    result.iloc[0, result.columns.get_loc('Returns')] = 0  # 第一天的收益率为0
+    result['Cumulative_Returns'] = (1 + result['Returns']).cumprod() - 1
+    result['Drawdown'] = (result['Portfolio'] / result['Portfolio'].cummax()) - 1
+    return result, trades
+
+
+# 总收益率、最大回撤和夏普比率
+def statistics(result):
+    return {
+        'total_return': result['Cumulative_Returns'].iloc[-1],
+        'max_drawdown': result['Drawdown'].min(),
+        'sharpe_ratio': np.sqrt(TRADING_DAYS) * result['Returns'].mean() / result['Returns'].std(),
+    }
@@ -1,12 +1,16 @@
-import akshare as ak
-import talib
 import pandas as pd
 import numpy as np
 import argparse
 
+import gateway
+import indicators
+import settings
+
+from strategy.chandelier_exit import trailing_stops
+
 # 获取股票数据
 def get_stock_data(stock_code, start_date, end_date):
-    stock_df = ak.stock_zh_a_hist(symbol=stock_code, period="daily", start_date=start_date, end_date=end_date, adjust="qfq")
+    stock_df = gateway.call('stock_zh_a_hist', symbol=stock_code, period="daily", start_date=start_date, end_date=end_date, adjust="qfq")
     print(f"原始数据列: {stock_df.columns}")
     print(f"原始数据形状: {stock_df.shape}")
     
@@ -30,7 +34,7 @@ def calculate_atr(data, period=14):
     high = data['high'].values
     low = data['low'].values
     close = data['close'].values
-    atr = talib.ATR(high, low, close, timeperiod=period)
+    atr = indicators.atr(high, low, close, period)
     data['ATR'] = atr
     return data
 
@@ -48,21 +52,10 @@ def chandelier_exit(data, length=14, mult=2.0, use_close=True):
     data['long_stop'] = data['highest'] - mult * data['ATR']
     data['short_stop'] = data['lowest'] + mult * data['ATR']
     
-    data['long_stop'] = np.where(
-        (data['close'].shift(1) > data['long_stop'].shift(1)) & (data['long_stop'] > data['long_stop'].shift(1)),
-        data['long_stop'],
-        data['long_stop'].shift(1)
-    )
-    
-    data['short_stop'] = np.where(
-        (data['close'].shift(1) < data['short_stop'].shift(1)) & (data['short_stop'] < data['short_stop'].shift(1)),
-        data['short_stop'],
-        data['short_stop'].shift(1)
-    )
-    
-    data['dir'] = np.where(data['close'] > data['short_stop'].shift(1), 1,
-                           np.where(data['close'] < data['long_stop'].shift(1), -1, np.nan))
-    data['dir'] = data['dir'].fillna(method='ffill')
+    # 多空止损价的递推（棘轮）与方向，与吊灯止损策略共用同一实现
+    data['long_stop'], data['short_stop'], data['dir'] = trailing_stops(
+        data['close'].to_numpy(dtype=np.float64), data['long_stop'].to_numpy(dtype=np.float64),
+        data['short_stop'].to_numpy(dtype=np.float64))
     
     data['Chandelier_Exit'] = np.where(data['dir'] == 1, data['long_stop'], data['short_stop'])
     
@@ -86,6 +79,7 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='检查股票的 Chandelier Exit 信号')
     parser.add_argument('stock_code', type=str, help='股票代码')
     args = parser.parse_args()
+    settings.load_config(required=False)
 
     stock_code = args.stock_code  # 从命令行参数获取股票代码
     start_date = "20240101"  # 起始日期
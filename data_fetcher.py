@@ -1,37 +1,148 @@
 # -*- encoding: UTF-8 -*-
 
-import akshare as ak
+import math
+import datetime
+import functools
 import logging
-import talib as tl
+import pandas as pd
+import gateway
+import history_store
+import indicators
+import fetch_engine
+from market_panel import MarketPanel
+import settings
 
-import concurrent.futures
+START_DATE = "20220101"
+# 由K线数估算自然日数：一年约242个交易日，另留出长假的余量
+CALENDAR_RATIO = 1.5
+HOLIDAY_MARGIN = 30
 
 
-def fetch(code_name):
+# 没有配置data_dir时无法读取本地历史数据
+class HistoryDisabled(RuntimeError):
+    pass
+
+
+# config.yaml中fetch节点的限速与重试参数
+def options():
+    config = getattr(settings, 'config', None)
+    if isinstance(config, dict):
+        return config.get('fetch') or {}
+    return {}
+
+
+# 需要lookback根K线时的开始日期（YYYYMMDD），从config.yaml中end_date（默认当天）往前推算；lookback为None时为START_DATE
+def start_date(lookback=None):
+    if lookback is None:
+        return START_DATE
+    config = getattr(settings, 'config', None)
+    end = config.get('end_date') if isinstance(config, dict) else None
+    end = datetime.date.fromisoformat(str(end)[:10]) if end else datetime.date.today()
+    start = end - datetime.timedelta(days=math.ceil(lookback * CALENDAR_RATIO) + HOLIDAY_MARGIN)
+    return start.strftime('%Y%m%d')
+
+
+# refresh为True时不使用gateway的缓存（复权价格变化后重新下载）；end_date（YYYYMMDD）不为None时只下载到该日
+def download(stock, start_date=START_DATE, refresh=False, end_date=None):
+    kwargs = {} if end_date is None else {'end_date': end_date}
+    data = gateway.call('stock_zh_a_hist', refresh=refresh, symbol=stock, period="daily", start_date=start_date,
+                        adjust="qfq", **kwargs)
+    if data is None or data.empty:
+        return None
+    data['日期'] = pd.to_datetime(data['日期']).dt.strftime('%Y-%m-%d')
+    return data.astype({'成交量': 'double'})
+
+
+# 只下载本地最后一根K线之后的数据并追加；重叠的那根K线用于检查前复权价格是否变化（除权除息）。
+# 本地数据不足lookback根K线、且开始日期晚于需要的开始日期时（启用了需要更长历史的策略），重新下载
+def update(stock, lookback=None, end_date=None):
+    start = start_date(lookback)
+    cached = history_store.load(stock)
+    if cached is None or cached.empty or (lookback is not None and len(cached) < lookback and
+                                          cached.iloc[0]['日期'].replace('-', '') > start):
+        data = download(stock, start, end_date=end_date)
+        if data is not None:
+            history_store.save(stock, data)
+        return data
+
+    last_row = cached.iloc[-1]
+    data = download(stock, last_row['日期'].replace('-', ''), end_date=end_date)
+    if data is None:
+        return cached
+
+    if data.iloc[0]['日期'] != last_row['日期'] or abs(data.iloc[0]['收盘'] - last_row['收盘']) > 1e-6:
+        logging.debug("股票：{}复权价格发生变化，重新下载全部历史数据".format(stock))
+        data = download(stock, start, refresh=True, end_date=end_date)
+        if data is not None:
+            history_store.save(stock, data)
+        return data
+
+    new_data = data.loc[data['日期'] > last_row['日期']]
+    history_store.append(stock, new_data)
+    return pd.concat([cached, new_data], ignore_index=True)
+
+
+# lookback为策略需要的K线数（work_flow.lookback），只下载和保留这段时间的数据；为None时从START_DATE开始。
+# end_date（YYYYMMDD）不为None时只取到该日的K线（收盘前预热时不下载、不保存当日未完成的K线）
+def fetch(code_name, lookback=None, end_date=None):
     stock = code_name[0]
-    data = ak.stock_zh_a_hist(symbol=stock, period="daily", start_date="20220101", adjust="qfq")
+    if history_store.enabled():
+        data = update(stock, lookback, end_date)
+    else:
+        data = download(stock, start_date(lookback), end_date=end_date)
 
     if data is None or data.empty:
         logging.debug("股票："+stock+" 没有数据，略过...")
         return
 
-    data['p_change'] = tl.ROC(data['收盘'], 1)
+    data['p_change'] = indicators.roc(data['收盘'], 1)
+    if lookback is not None:
+        # 本地保存的历史可能更长，只保留需要的部分
+        start = start_date(lookback)
+        data = data.loc[data['日期'] >= '{}-{}-{}'.format(start[:4], start[4:6], start[6:])].reset_index(drop=True)
+    if end_date is not None:
+        data = data.loc[data['日期'] <= '{}-{}-{}'.format(end_date[:4], end_date[4:6], end_date[6:])]
 
     return data
 
 
-def run(stocks):
+# 只读取本地历史数据，不访问网络（回测用）。优先以内存映射打开二进制面板；
+# 面板不存在或已过期时从各股票的HDF5文件读取，读取的是全部本地股票时顺便重新生成二进制面板。
+# 本地没有数据时返回空面板；未启用本地存储时抛出HistoryDisabled
+def load(stocks):
+    if not history_store.enabled():
+        raise HistoryDisabled("本地历史数据未启用，请在config.yaml中配置data_dir")
+    codes = [code_name[0] for code_name in stocks]
+    panel = history_store.open_panel(codes)
+    if panel is not None:
+        return panel
+
     stocks_data = {}
-    with concurrent.futures.ThreadPoolExecutor(max_workers=16) as executor:
-        future_to_stock = {executor.submit(fetch, stock): stock for stock in stocks}
-        for future in concurrent.futures.as_completed(future_to_stock):
-            stock = future_to_stock[future]
-            try:
-                data = future.result()
-                if data is not None:
-                    data = data.astype({'成交量': 'double'})
-                    stocks_data[stock] = data
-            except Exception as exc:
-                print('%s(%r) generated an exception: %s' % (stock[1], stock[0], exc))
-
-    return stocks_data
+    for code_name in stocks:
+        data = history_store.load(code_name[0])
+        if data is None or data.empty:
+            continue
+        data['p_change'] = indicators.roc(data['收盘'], 1)
+        stocks_data[code_name] = data
+    panel = MarketPanel.from_frames(stocks_data)
+    if stocks_data and set(codes) >= set(history_store.codes()):
+        history_store.save_panel(panel)
+    return panel
+
+
+def run(stocks, lookback=None, end_date=None):
+    stocks_data, failed = fetch_engine.run(stocks, functools.partial(fetch, lookback=lookback, end_date=end_date),
+                                           options())
+    for stock, exc in failed.items():
+        logging.warning('%s(%r) generated an exception: %s' % (stock[1], stock[0], exc))
+    if failed:
+        logging.warning("共{}只股票重试后仍获取失败".format(len(failed)))
+
+    panel = MarketPanel.from_frames(stocks_data)
+    # 取到的是全部本地股票的完整历史时顺便保存二进制面板，供之后的回测直接映射。
+    # 只取了部分股票、lookback根K线或只取到end_date时不保存也不重新生成（不在选股流程中读取全部本地数据），
+    # 本地历史数据更新后面板已过期，由之后离线工具的load从本地历史数据重新生成
+    if history_store.enabled() and lookback is None and end_date is None and stocks_data and \
+            set(code_name[0] for code_name in stocks_data) >= set(history_store.codes()):
+        history_store.save_panel(panel)
+    return panel
@@ -0,0 +1,84 @@
+# -*- encoding: UTF-8 -*-
+
+import asyncio
+import concurrent.futures
+import logging
+import random
+import time
+
+# 默认参数，可在config.yaml的fetch节点中覆盖
+DEFAULTS = {
+    'rate': 20,            # 每秒最多发起的请求数
+    'burst': 20,           # 令牌桶容量，允许的瞬时突发请求数
+    'concurrency': 16,     # 同时进行中的请求数
+    'retries': 3,          # 每只股票失败后的最大重试次数
+    'backoff_base': 0.5,   # 指数退避的基础等待秒数
+    'backoff_max': 30,     # 单次退避的最大等待秒数
+}
+
+
+# 令牌桶限速：按rate匀速补充令牌，最多积攒burst个
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.capacity = max(float(burst), 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        async with self.lock:
+            self.refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self.refill()
+            self.tokens -= 1
+
+
+# 带随机抖动的指数退避（full jitter）
+def backoff(attempt, base, maximum):
+    return random.uniform(0, min(maximum, base * 2 ** attempt))
+
+
+async def fetch_one(stock, fetch, bucket, semaphore, executor, options):
+    loop = asyncio.get_running_loop()
+    retries = options['retries']
+    for attempt in range(retries + 1):
+        await bucket.acquire()
+        async with semaphore:
+            try:
+                return await loop.run_in_executor(executor, fetch, stock)
+            except Exception as exc:
+                if attempt == retries:
+                    raise
+                delay = backoff(attempt, options['backoff_base'], options['backoff_max'])
+                logging.debug("%s(%r)第%d次请求失败：%s，%.2f秒后重试" % (stock[1], stock[0], attempt + 1, exc, delay))
+        await asyncio.sleep(delay)
+
+
+async def fetch_all(stocks, fetch, options):
+    bucket = TokenBucket(options['rate'], options['burst'])
+    semaphore = asyncio.Semaphore(options['concurrency'])
+    with concurrent.futures.ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+        tasks = [fetch_one(stock, fetch, bucket, semaphore, executor, options) for stock in stocks]
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# 并发获取所有股票数据，返回({stock: data}, {stock: exception})
+def run(stocks, fetch, options=None):
+    options = dict(DEFAULTS, **(options or {}))
+    results = asyncio.run(fetch_all(stocks, fetch, options))
+
+    stocks_data = {}
+    failed = {}
+    for stock, result in zip(stocks, results):
+        if isinstance(result, Exception):
+            failed[stock] = result
+        elif result is not None:
+            stocks_data[stock] = result
+    return stocks_data, failed
@@ -0,0 +1,101 @@
+# -*- encoding: UTF-8 -*-
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+
+import settings
+
+# akshare调用网关：所有akshare请求都经过call()。启用缓存后按(接口, 参数)把返回结果保存在磁盘上，
+# 在该接口的有效期内直接读取本地结果；回放模式只读本地结果，缺失时报错，整个流程可以离线重放
+DEFAULTS = {
+    'enable': False,
+    'dir': None,        # 缓存目录，默认为{data_dir}/akshare
+    'replay': False,    # 回放模式：只读缓存，不访问网络
+    'ttl': {},          # 覆盖各接口的有效期（秒）
+}
+
+# 各接口的有效期（秒）
+TTL = {
+    'stock_zh_a_spot_em': 60,                       # 实时快照
+    'stock_zh_a_hist': 6 * 3600,                    # 日线，收盘后当天不再变化
+    'stock_zh_a_daily': 6 * 3600,
+    'stock_lhb_stock_statistic_em': 24 * 3600,      # 龙虎榜统计
+    'tool_trade_date_hist_sina': 7 * 24 * 3600,     # 交易日历
+}
+DEFAULT_TTL = 3600
+
+
+class ReplayMiss(LookupError):
+    pass
+
+
+# akshare导入需要约半秒，第一次真正请求时才导入；之后即为模块属性gateway.ak
+def akshare():
+    global ak
+    if 'ak' not in globals():
+        import akshare as ak
+    return ak
+
+
+def __getattr__(name):
+    if name == 'ak':
+        return akshare()
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def options():
+    config = getattr(settings, 'config', None)
+    gateway = config.get('akshare') if isinstance(config, dict) else None
+    return {**DEFAULTS, **(gateway or {})}
+
+
+def cache_dir(opts):
+    if opts['dir']:
+        return opts['dir']
+    config = getattr(settings, 'config', None)
+    data_dir = config.get('data_dir') if isinstance(config, dict) else None
+    data_dir = data_dir or 'data'
+    if not os.path.isabs(data_dir):
+        data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), data_dir)
+    return os.path.join(data_dir, 'akshare')
+
+
+# 缓存文件：{缓存目录}/{接口}/{参数的哈希}.pkl
+def path(opts, name, kwargs):
+    key = json.dumps(kwargs, sort_keys=True, ensure_ascii=False, default=str)
+    return os.path.join(cache_dir(opts), name, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.pkl')
+
+
+# 调用akshare的name接口。refresh为True时忽略缓存重新请求（结果仍会保存，供回放）
+def call(name, refresh=False, **kwargs):
+    opts = options()
+    if not opts['enable'] and not opts['replay']:
+        return getattr(akshare(), name)(**kwargs)
+
+    # 只有读写缓存时才需要pandas
+    import pandas as pd
+    file_path = path(opts, name, kwargs)
+    if opts['replay']:
+        if not os.path.exists(file_path):
+            raise ReplayMiss("回放模式下没有{}({})的缓存".format(name, kwargs))
+        return pd.read_pickle(file_path)
+
+    ttl = opts['ttl'].get(name, TTL.get(name, DEFAULT_TTL))
+    if not refresh and os.path.exists(file_path) and time.time() - os.path.getmtime(file_path) < ttl:
+        try:
+            return pd.read_pickle(file_path)
+        except Exception as error:
+            logging.warning("读取缓存{}失败：{}".format(file_path, error))
+
+    data = getattr(akshare(), name)(**kwargs)
+    if data is not None:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        # 先写临时文件再替换，多个线程同时请求同一接口时不会读到写了一半的文件
+        temp = '{}.{}.{}.tmp'.format(file_path, os.getpid(), threading.get_ident())
+        pd.to_pickle(data, temp)
+        os.replace(temp, file_path)
+    return data
@@ -0,0 +1,159 @@
+# -*- encoding: UTF-8 -*-
+
+import os
+import shutil
+import logging
+import numpy as np
+import pandas as pd
+import settings
+from market_panel import FIELDS, MarketPanel
+
+# 每只股票一个HDF5文件：{data_dir}/history/{代码}.h5
+KEY = 'data'
+SUB_DIR = 'history'
+
+# 全市场二进制面板：{data_dir}/history/panel/。values.bin按字段依次保存定长数组（字段数 × 股票数 × 交易日数，float32），
+# index.npz保存股票代码、名称、交易日和字段。用numpy.memmap打开，启动时不读入全部数据，只有策略读到的K线所在的页才会载入，
+# 多个进程打开同一文件时共用操作系统的页缓存
+PANEL_DIR = 'panel'
+VALUES_FILE = 'values.bin'
+INDEX_FILE = 'index.npz'
+DTYPE = np.float32
+
+
+# 本地历史数据目录，未配置data_dir时返回None（不启用本地存储）
+def root():
+    config = getattr(settings, 'config', None)
+    if not isinstance(config, dict) or not config.get('data_dir'):
+        return None
+    data_dir = config['data_dir']
+    if not os.path.isabs(data_dir):
+        data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), data_dir)
+    return os.path.join(data_dir, SUB_DIR)
+
+
+def enabled():
+    return root() is not None
+
+
+def path(code):
+    return os.path.join(root(), "{}.h5".format(code))
+
+
+# 本地已保存历史数据的股票代码
+def codes():
+    if not enabled() or not os.path.isdir(root()):
+        return []
+    return sorted(name[:-3] for name in os.listdir(root()) if name.endswith('.h5'))
+
+
+def load(code):
+    file_path = path(code)
+    if not os.path.exists(file_path):
+        return None
+    try:
+        return pd.read_hdf(file_path, KEY).reset_index(drop=True)
+    except (OSError, KeyError, ValueError) as error:
+        logging.warning("读取本地历史数据{}失败：{}".format(file_path, error))
+        return None
+
+
+# 覆盖写入（首次下载或复权因子变化后全量重写）
+def save(code, data):
+    os.makedirs(root(), exist_ok=True)
+    data.to_hdf(path(code), key=KEY, mode='w', format='table', min_itemsize={'values': 16}, index=False)
+
+
+# 追加写入新的K线
+def append(code, data):
+    if data is None or data.empty:
+        return
+    os.makedirs(root(), exist_ok=True)
+    data.to_hdf(path(code), key=KEY, mode='a', format='table', append=True,
+                min_itemsize={'values': 16}, index=False)
+
+
+def panel_path():
+    return os.path.join(root(), PANEL_DIR)
+
+
+# 保存二进制面板：先写到临时目录再替换，读取方不会看到写了一半的文件
+def save_panel(panel):
+    if len(panel) == 0 or len(panel.dates) == 0:
+        return
+    directory = panel_path()
+    temp = directory + '.tmp'
+    shutil.rmtree(temp, ignore_errors=True)
+    os.makedirs(temp)
+
+    shape = (len(FIELDS), len(panel), len(panel.dates))
+    values = np.memmap(os.path.join(temp, VALUES_FILE), dtype=DTYPE, mode='w+', shape=shape)
+    for k in range(len(FIELDS)):
+        values[k] = panel.values[:, :, k]
+    values.flush()
+    del values
+    np.savez(os.path.join(temp, INDEX_FILE),
+             codes=np.array([str(symbol[0]) for symbol in panel.symbols]),
+             names=np.array([str(symbol[1]) for symbol in panel.symbols]),
+             dates=panel.dates, fields=np.array(FIELDS),
+             first=panel.first, last=panel.last, counts=panel.counts)
+
+    old = directory + '.old'
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(directory):
+        os.rename(directory, old)
+    os.rename(temp, directory)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+# 以内存映射打开values.bin，shape为(股票数, 交易日数, 字段数)，返回该形状的视图；写时复制，修改不会写回文件
+def map_values(directory, shape):
+    values = np.memmap(os.path.join(directory, VALUES_FILE), dtype=DTYPE, mode='c',
+                       shape=(shape[2], shape[0], shape[1]))
+    return values.transpose(1, 2, 0)
+
+
+# 打开二进制面板。codes指定需要的股票（按该顺序）；面板不存在、缺少其中的股票，
+# 或者比其中某只股票的HDF5文件旧（之后又有K线写入）时返回None。
+# 包含全部股票且顺序一致时不复制数据，panel.source为面板目录，子进程可以直接映射同一文件；
+# codes是面板中连续的一段股票（顺序一致）时返回该段的视图，也不复制数据
+def open_panel(codes=None):
+    if not enabled():
+        return None
+    directory = panel_path()
+    index_path = os.path.join(directory, INDEX_FILE)
+    if not os.path.exists(index_path):
+        return None
+    try:
+        with np.load(index_path) as index:
+            if index['fields'].tolist() != FIELDS:
+                return None
+            stored, names, dates = index['codes'].tolist(), index['names'].tolist(), index['dates']
+            # 每只股票第一根、最后一根K线所在的列和K线数，打开时不需要扫描收盘价；旧版本的索引中没有
+            bars = np.stack([index['first'], index['last'], index['counts']]) if 'counts' in index else None
+    except (OSError, KeyError, ValueError) as error:
+        logging.warning("读取二进制面板{}失败：{}".format(index_path, error))
+        return None
+
+    codes = stored if codes is None else list(codes)
+    built = os.path.getmtime(index_path)
+    for code in codes:
+        file_path = path(code)
+        if os.path.exists(file_path) and os.path.getmtime(file_path) > built:
+            return None
+    positions = {code: i for i, code in enumerate(stored)}
+    if any(code not in positions for code in codes):
+        return None
+
+    values = map_values(directory, (len(stored), len(dates), len(FIELDS)))
+    symbols = list(zip(stored, names))
+    if codes == stored:
+        panel = MarketPanel(symbols, dates, values, bars)
+        panel.source = directory
+        return panel
+    rows = [positions[code] for code in codes]
+    start = rows[0] if rows else 0
+    if rows == list(range(start, start + len(rows))):
+        rows = slice(start, start + len(rows))
+        return MarketPanel(symbols[rows], dates, values[rows], None if bars is None else bars[:, rows])
+    return MarketPanel([symbols[i] for i in rows], dates, values[rows], None if bars is None else bars[:, rows])
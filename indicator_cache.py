@@ -0,0 +1,77 @@
+# -*- encoding: UTF-8 -*-
+
+import pandas as pd
+
+import indicators
+
+# 单次运行内的指标缓存：(股票, 指标名, 参数, 最后一个交易日, K线数) -> 指标值
+# 同一只股票的同一指标只计算一次，供所有策略和STTS评分复用
+cache = {}
+
+
+def clear():
+    cache.clear()
+
+
+def get(code_name, data, name, *params):
+    if code_name is None or data.empty:
+        return INDICATORS[name](data, *params)
+    key = (code_name, name, params, data['日期'].iloc[-1], len(data))
+    if key not in cache:
+        cache[key] = INDICATORS[name](data, *params)
+    return cache[key]
+
+
+# 简单移动平均（与talib.MA一致）
+def ma(data, field, period):
+    return indicators.ma(data[field].values, period)
+
+
+# 真实波幅
+def true_range(data):
+    prev_close = data['收盘'].shift(1)
+    tr = pd.concat([data['最高'] - data['最低'], (data['最高'] - prev_close).abs(),
+                    (data['最低'] - prev_close).abs()], axis=1).max(axis=1)
+    return tr.values
+
+
+# 以下指标与work_flow.calculate_technical_indicators的计算方式一致（保留两位小数）
+def atr(data, period):
+    return pd.Series(true_range(data)).rolling(window=period).mean().round(2).values
+
+
+def macd(data, fast, slow, signal):
+    ema_fast = data['收盘'].ewm(span=fast, adjust=False).mean().round(2)
+    ema_slow = data['收盘'].ewm(span=slow, adjust=False).mean().round(2)
+    diff = (ema_fast - ema_slow).round(2)
+    dea = diff.ewm(span=signal, adjust=False).mean().round(2)
+    return ema_fast.values, ema_slow.values, diff.values, dea.values, (diff - dea).round(2).values
+
+
+def boll(data, period, width):
+    mid = data['收盘'].rolling(window=period).mean().round(2)
+    std = data['收盘'].rolling(window=period).std().round(2)
+    return mid.values, std.values, (mid + std * width).round(2).values, (mid - std * width).round(2).values
+
+
+def rsi(data, period):
+    change = data['收盘'].diff(1)
+    up = change.clip(lower=0)
+    down = (-change).clip(lower=0)
+    up[change.isna()] = 0
+    down[change.isna()] = 0
+    mean_up = up.rolling(window=period).mean().round(2)
+    mean_down = down.rolling(window=period).mean().round(2)
+    strength = (mean_up / mean_down).round(2)
+    value = (100 - (100 / (1 + strength))).round(2)
+    return change.values, up.values, down.values, mean_up.values, mean_down.values, strength.values, value.values
+
+
+INDICATORS = {
+    'MA': ma,
+    'TR': true_range,
+    'ATR': atr,
+    'MACD': macd,
+    'BOLL': boll,
+    'RSI': rsi,
+}
@@ -0,0 +1,158 @@
+# -*- encoding: UTF-8 -*-
+
+import numpy as np
+
+from market_panel import shift
+
+# 批量技术指标：输入为二维数组（股票数 × K线数，按时间顺序，如panel.tail()的结果，左侧可以用NaN补齐），
+# 沿时间轴一次计算全部股票，一维数组视为一只股票。计算方式与talib的同名函数一致（默认参数、起始位置和递推方式），
+# 左侧补齐的NaN与talib跳过序列开头NaN的处理一致
+
+
+def _float(values):
+    return np.asarray(values, dtype=np.float64)
+
+
+# 滚动求和，窗口内有NaN或不足window根时为NaN。用累计和相减，与talib一样逐根增减，而不是对每个窗口分别求和
+def _rolling_sum(values, window):
+    missing = np.isnan(values)
+    total = np.cumsum(np.where(missing, 0, values), axis=-1)
+    count = np.cumsum(missing, axis=-1)
+    result = np.full(values.shape, np.nan)
+    if values.shape[-1] >= window:
+        result[..., window - 1:] = total[..., window - 1:]
+        result[..., window:] -= total[..., :-window]
+        gaps = count[..., window - 1:].copy()
+        gaps[..., 1:] -= count[..., :-window]
+        result[..., window - 1:][gaps > 0] = np.nan
+    return result
+
+
+def _rolling_mean(values, window):
+    return _rolling_sum(values, window) / window
+
+
+# 沿时间轴的递推：在seed第一个不为NaN的位置以seed起步，之后y[t] = y[t-1] * decay + values[t] * gain
+def _smooth(seed, values, decay, gain):
+    # 转置后每根K线的全部股票在内存中连续
+    shape = np.shape(values)
+    seed = np.ascontiguousarray(np.moveaxis(seed, -1, 0)).reshape(shape[-1], -1)
+    values = np.ascontiguousarray(np.moveaxis(values, -1, 0)).reshape(shape[-1], -1)
+    result = np.full(values.shape, np.nan)
+    previous = result[0]
+    for t in range(len(values)):
+        previous = previous * decay + values[t] * gain
+        np.copyto(previous, seed[t], where=np.isnan(previous))
+        result[t] = previous
+    return np.moveaxis(result.reshape(shape[-1:] + shape[:-1]), 0, -1)
+
+
+# 每一列是该股票的第几根K线（从0开始），左侧补齐的NaN为-1
+def _bars(values):
+    return np.cumsum(~np.isnan(values), axis=-1) - 1
+
+
+# 简单移动平均（MA/SMA）
+def ma(values, period=30):
+    return _rolling_mean(_float(values), period)
+
+
+# 指数移动平均（EMA），以前period根K线的简单平均起步
+def ema(values, period=30):
+    values = _float(values)
+    k = 2.0 / (period + 1)
+    return _smooth(_rolling_mean(values, period), values, 1 - k, k)
+
+
+# 变动率（ROC）：(当前价 / period根K线前的价格 - 1) * 100，前值为0时为0
+def roc(values, period=10):
+    values = _float(values)
+    previous = shift(values, period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = (values / previous - 1) * 100
+    return np.where(previous == 0, 0, result)
+
+
+# 真实波幅（TRANGE），第一根K线没有前收盘价，为NaN
+def true_range(high, low, close):
+    high, low = _float(high), _float(low)
+    previous = shift(_float(close))
+    return np.maximum(np.maximum(high - low, np.abs(high - previous)), np.abs(low - previous))
+
+
+# 平均真实波幅（ATR），以前period个真实波幅的简单平均起步，之后按Wilder方式平滑
+def atr(high, low, close, period=14):
+    tr = true_range(high, low, close)
+    return _smooth(_rolling_mean(tr, period), tr, (period - 1) / period, 1 / period)
+
+
+# 相对强弱指标（RSI），平均涨幅、平均跌幅按Wilder方式平滑
+def rsi(values, period=14):
+    change = np.diff(_float(values), axis=-1, prepend=np.nan)
+    gain = np.where(change > 0, change, np.where(np.isnan(change), np.nan, 0))
+    loss = np.where(change < 0, -change, np.where(np.isnan(change), np.nan, 0))
+    decay = (period - 1) / period
+    mean_gain = _smooth(_rolling_mean(gain, period), gain, decay, 1 / period)
+    mean_loss = _smooth(_rolling_mean(loss, period), loss, decay, 1 / period)
+    total = mean_gain + mean_loss
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(np.abs(total) < 1e-8, 0, 100 * mean_gain / total)
+
+
+# 平均趋向指标（ADX）
+def adx(high, low, close, period=14):
+    high, low = _float(high), _float(low)
+    up = high - shift(high)
+    down = shift(low) - low
+    plus_dm = np.where((up > 0) & (up > down), up, np.where(np.isnan(up), np.nan, 0))
+    minus_dm = np.where((down > 0) & (down > up), down, np.where(np.isnan(down), np.nan, 0))
+    tr = true_range(high, low, close)
+
+    # 以前period - 1个值之和起步，之后y[t] = y[t-1] - y[t-1] / period + x[t]
+    decay = 1 - 1 / period
+    smoothed = [_smooth(_rolling_mean(x, period - 1) * (period - 1), x, decay, 1) for x in (plus_dm, minus_dm, tr)]
+    plus, minus, tr = smoothed
+    with np.errstate(divide='ignore', invalid='ignore'):
+        plus_di, minus_di = 100 * plus / tr, 100 * minus / tr
+        dx = 100 * np.abs(minus_di - plus_di) / (minus_di + plus_di)
+    # 真实波幅或DI之和为0的K线：计算初值时按0计入，之后保持前一日的ADX；起步当日的DI不计入
+    valid = (np.abs(tr) >= 1e-8) & (np.abs(plus_di + minus_di) >= 1e-8)
+    dx = np.where(np.isnan(shift(tr)), np.nan, np.where(valid, dx, 0))
+
+    # 无效的K线上保持前一日的ADX，即按权重0递推
+    weight = np.where(valid, 1 / period, 0)
+    seed = _rolling_mean(dx, period)
+    shape = np.shape(dx)
+    seed, dx, weight = (np.ascontiguousarray(np.moveaxis(x, -1, 0)).reshape(shape[-1], -1) for x in (seed, dx, weight))
+    result = np.full(dx.shape, np.nan)
+    previous = result[0]
+    for t in range(len(dx)):
+        previous = previous + (dx[t] - previous) * weight[t]
+        np.copyto(previous, seed[t], where=np.isnan(previous))
+        result[t] = previous
+    return np.moveaxis(result.reshape(shape[-1:] + shape[:-1]), 0, -1)
+
+
+# 指数平滑异同移动平均线（MACD），返回(MACD, 信号线, 柱)。
+# 与talib一致：快线与慢线在同一根K线起步，快线以该K线之前fast根K线的简单平均起步
+def macd(values, fast=12, slow=26, signal=9):
+    values = _float(values)
+    start = _bars(values) >= slow - 1
+    k_fast, k_slow = 2.0 / (fast + 1), 2.0 / (slow + 1)
+    ema_fast = _smooth(np.where(start, _rolling_mean(values, fast), np.nan), values, 1 - k_fast, k_fast)
+    ema_slow = _smooth(_rolling_mean(values, slow), values, 1 - k_slow, k_slow)
+    diff = ema_fast - ema_slow
+
+    k_signal = 2.0 / (signal + 1)
+    dea = _smooth(_rolling_mean(diff, signal), diff, 1 - k_signal, k_signal)
+    diff = np.where(np.isnan(dea), np.nan, diff)
+    return diff, dea, diff - dea
+
+
+# 布林线（BBANDS），返回(上轨, 中轨, 下轨)，标准差为总体标准差
+def boll(values, period=5, width=2.0):
+    values = _float(values)
+    middle = _rolling_mean(values, period)
+    # 与talib一样由平方的均值减去均值的平方得到方差
+    std = np.sqrt(np.maximum(_rolling_sum(values * values, period) / period - middle * middle, 0))
+    return middle + width * std, middle, middle - width * std
@@ -0,0 +1,178 @@
+# -*- encoding: UTF-8 -*-
+
+import os
+import glob
+import time
+import datetime
+import logging
+
+import numpy as np
+import pandas as pd
+
+import data_fetcher
+import gateway
+import indicator_cache
+import push
+import settings
+import work_flow
+from market_panel import FIELDS
+
+# 盘中扫描：每隔interval秒获取一次全市场快照，作为当日的临时K线合并到历史数据上，
+# 只对行情有变化的股票重新执行策略，推送新出现的股票
+DEFAULTS = {
+    'enable': False,
+    'interval': 30,     # 轮询间隔秒数
+    'record_dir': None, # 保存每次获取的快照，供回放测试
+}
+
+# 快照字段 -> K线字段
+BAR_FIELDS = {
+    '今开': '开盘',
+    '最新价': '收盘',
+    '最高': '最高',
+    '最低': '最低',
+    '成交量': '成交量',
+    '成交额': '成交额',
+    '振幅': '振幅',
+    '涨跌幅': '涨跌幅',
+    '涨跌额': '涨跌额',
+    '换手率': '换手率',
+}
+
+# 连续竞价时段
+SESSIONS = ((datetime.time(9, 30), datetime.time(11, 30)), (datetime.time(13, 0), datetime.time(15, 0)))
+
+
+def options():
+    config = getattr(settings, 'config', None)
+    live = config.get('live') if isinstance(config, dict) else None
+    return {**DEFAULTS, **(live or {})}
+
+
+def in_session(now):
+    return any(begin <= now.time() <= end for begin, end in SESSIONS)
+
+
+# 交易时段内获取实时快照；午间休市时等待开盘，收盘后结束扫描
+def poll():
+    while True:
+        now = datetime.datetime.now()
+        if now.time() > SESSIONS[-1][1]:
+            raise StopIteration
+        if in_session(now):
+            # 每次轮询都需要最新的快照
+            return gateway.call('stock_zh_a_spot_em', refresh=True)
+        time.sleep(5)
+
+
+# 保存快照，文件名为获取时间
+def record(snapshot, record_dir, now=None):
+    now = now or datetime.datetime.now()
+    os.makedirs(record_dir, exist_ok=True)
+    snapshot.to_csv(os.path.join(record_dir, now.strftime('%Y-%m-%d_%H%M%S.csv')), index=False)
+
+
+# 按时间顺序回放保存的快照，用法与poll相同，回放完毕抛出StopIteration
+class Replayer:
+    def __init__(self, record_dir):
+        self.files = sorted(glob.glob(os.path.join(record_dir, '*.csv')))
+        self.date = os.path.basename(self.files[0])[:10] if self.files else None
+        self.position = 0
+
+    def __call__(self):
+        if self.position >= len(self.files):
+            raise StopIteration
+        snapshot = pd.read_csv(self.files[self.position], dtype={'代码': str})
+        self.position += 1
+        return snapshot
+
+
+class LiveScan:
+    def __init__(self, panel, strategies, date):
+        date = str(date)[:10]
+        self.panel = panel.with_date(date)
+        self.column = len(self.panel.dates) - 1
+        self.strategies = strategies
+        self.codes = [symbol[0] for symbol in self.panel.symbols]
+        # 前一交易日收盘价，用于计算临时K线的p_change
+        previous = str(np.datetime64(date, 'D') - 1)
+        self.prev_close = self.panel.tail('收盘', 1, end_date=previous)[:, 0]
+        self.quotes = np.full((len(self.panel), len(BAR_FIELDS)), np.nan)
+        # 每个策略已经推送过的股票
+        self.pushed = {strategy: set() for strategy in strategies}
+
+    # 把快照写入当日的临时K线，返回行情有变化的股票序号
+    def merge(self, snapshot):
+        snapshot = snapshot.drop_duplicates('代码').set_index('代码').reindex(self.codes)
+        quotes = snapshot[list(BAR_FIELDS)].to_numpy(dtype=np.float64)
+        # 停牌（没有最新价）的股票没有当日K线
+        quotes[np.isnan(quotes[:, 1])] = np.nan
+        changed = np.flatnonzero(((quotes != self.quotes) & ~(np.isnan(quotes) & np.isnan(self.quotes))).any(axis=1))
+        self.quotes = quotes
+
+        bars = np.full((len(changed), len(FIELDS)), np.nan)
+        for k, field in enumerate(BAR_FIELDS.values()):
+            bars[:, FIELDS.index(field)] = quotes[changed, k]
+        close = bars[:, FIELDS.index('收盘')]
+        bars[:, FIELDS.index('p_change')] = (close / self.prev_close[changed] - 1) * 100
+        self.panel.values[changed, self.column] = bars
+        self.panel.refresh()
+        return changed
+
+    # 合并一次快照并重新执行策略，返回{策略: 新命中的股票}
+    def scan(self, snapshot):
+        changed = self.merge(snapshot)
+        candidates = set(work_flow.pushdown(snapshot, self.strategies)['代码'])
+        indices = [i for i in changed if self.codes[i] in candidates]
+
+        hits = work_flow.evaluate(self.panel, self.strategies, indices=indices)
+        fresh = {}
+        for strategy, stocks_data in hits.items():
+            scores = work_flow.calculate_stts_scores(list(stocks_data.values()))
+            fresh[strategy] = [symbol for (symbol, df), score in zip(stocks_data.items(), scores)
+                               if score > 1.5 and work_flow.is_suitable(df.iloc[-1])
+                               and symbol not in self.pushed[strategy]]
+            self.pushed[strategy].update(fresh[strategy])
+            if fresh[strategy]:
+                push.strategy('**************"{0}"**************\n{1}\n**************"{0}"**************\n'.format(
+                    strategy, fresh[strategy]))
+        # 指标缓存按(股票, 最后一个交易日, K线数)区分，每次快照更新临时K线后这些都不变，
+        # 扫描后清空，下一次扫描和之后的计算不会取到旧快照上算出的指标
+        indicator_cache.clear()
+        logging.info("盘中扫描：{}只股票行情变化，{}只通过快照预筛".format(len(changed), len(indices)))
+        return fresh
+
+
+# 盘中扫描主循环。source默认获取实时快照，也可以是Replayer；panel为空时按第一次快照中的股票获取历史数据
+def run(source=None, panel=None, date=None, interval=None, strategies=None):
+    opts = options()
+    source = source or poll
+    interval = opts['interval'] if interval is None else interval
+    date = date or getattr(source, 'date', None) or datetime.date.today()
+
+    try:
+        snapshot = source()
+    except StopIteration:
+        logging.info("已收盘，不进行盘中扫描")
+        return None
+    strategies = strategies or work_flow.enabled_strategies()
+    if panel is None:
+        # 只取到前一日的历史数据：当日未完成的K线由快照合并，不下载、不保存到本地历史数据
+        previous = str(np.datetime64(str(date)[:10], 'D') - 1).replace('-', '')
+        panel = data_fetcher.run([tuple(x) for x in snapshot[['代码', '名称']].values], work_flow.lookback(strategies),
+                                 end_date=previous)
+    scanner = LiveScan(panel, strategies, date)
+    while True:
+        started = time.time()
+        if opts['record_dir']:
+            record(snapshot, opts['record_dir'])
+        scanner.scan(snapshot)
+        elapsed = time.time() - started
+        if interval and elapsed > interval:
+            logging.warning("盘中扫描耗时{:.1f}秒，超过轮询间隔{}秒".format(elapsed, interval))
+        time.sleep(max(interval - elapsed, 0))
+        try:
+            snapshot = source()
+        except StopIteration:
+            break
+    return scanner
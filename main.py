@@ -2,29 +2,72 @@
 
 import utils
 import logging
-import work_flow
 import settings
+import warmup
 import schedule
 import time
 import datetime
 from pathlib import Path
 
 
+# work_flow、live_scan要导入pandas、akshare和全部策略，到执行任务时才导入，定时任务启动时不需要等待
 def job():
     if utils.is_weekday():
+        import work_flow
         work_flow.prepare()
 
 
+def live_job():
+    if utils.is_weekday():
+        import live_scan
+        live_scan.run()
+
+
+# 收盘前预热的任务，收盘后使用
+warming = None
+
+
+def warm_job():
+    global warming
+    if utils.is_weekday():
+        warming = warmup.Warmup().start()
+
+
+def close_job():
+    global warming
+    if warming is not None:
+        warming.finish()
+        warming = None
+    else:
+        job()
+
+
+# 与live_scan.options()['enable']相同，不导入live_scan
+def live_enabled():
+    live = settings.config.get('live')
+    return bool(live and live.get('enable'))
+
+
 logging.basicConfig(format='%(asctime)s %(message)s', filename='sequoia.log')
 logging.getLogger().setLevel(logging.INFO)
 settings.init()
 
 if settings.config['cron']:
     EXEC_TIME = "15:15"
-    schedule.every().day.at(EXEC_TIME).do(job)
+    if warmup.options()['enable']:
+        schedule.every().day.at(warmup.options()['warm_time']).do(warm_job)
+        schedule.every().day.at(warmup.options()['close_time']).do(close_job)
+    else:
+        schedule.every().day.at(EXEC_TIME).do(job)
+    if live_enabled():
+        schedule.every().day.at("09:25").do(live_job)
 
     while True:
         schedule.run_pending()
         time.sleep(1)
+elif live_enabled():
+    import live_scan
+    live_scan.run()
 else:
+    import work_flow
     work_flow.prepare()
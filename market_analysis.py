@@ -1,14 +1,16 @@
-import akshare as ak
 import pandas as pd
-import talib
 import argparse
 from datetime import datetime, timedelta
 
+import gateway
+import indicators
+import settings
+
 def get_stock_data(stock_code, start_date, end_date):
     """
     使用akshare获取股票的历史行情数据
     """
-    stock_df = ak.stock_zh_a_hist(symbol=stock_code, period="daily", start_date=start_date, end_date=end_date, adjust="qfq")
+    stock_df = gateway.call('stock_zh_a_hist', symbol=stock_code, period="daily", start_date=start_date, end_date=end_date, adjust="qfq")
     
     stock_df['date'] = pd.to_datetime(stock_df['日期'])
     stock_df.set_index('date', inplace=True)
@@ -23,40 +25,40 @@ def get_stock_data(stock_code, start_date, end_date):
     return stock_df[['open', 'high', 'low', 'close', 'volume']]
 
 def check_trend_market(data):
-    short_ma = talib.SMA(data['close'], timeperiod=20)
-    long_ma = talib.SMA(data['close'], timeperiod=50)
-    if short_ma.iloc[-1] > long_ma.iloc[-1]:
+    short_ma = indicators.ma(data['close'], 20)
+    long_ma = indicators.ma(data['close'], 50)
+    if short_ma[-1] > long_ma[-1]:
         return "上升趋势市场"
-    elif short_ma.iloc[-1] < long_ma.iloc[-1]:
+    elif short_ma[-1] < long_ma[-1]:
         return "下降趋势市场"
     else:
         return "震荡市场"
 
 def check_adx_trend(data):
-    adx = talib.ADX(data['high'], data['low'], data['close'], timeperiod=14)
-    if adx.iloc[-1] > 25:
+    adx = indicators.adx(data['high'], data['low'], data['close'], 14)
+    if adx[-1] > 25:
         return "强趋势市场"
-    elif adx.iloc[-1] < 20:
+    elif adx[-1] < 20:
         return "震荡市场"
     else:
         return "弱趋势市场"
 
 def check_rsi_market(data):
-    rsi = talib.RSI(data['close'], timeperiod=14)
-    if 40 < rsi.iloc[-1] < 60:
+    rsi = indicators.rsi(data['close'], 14)
+    if 40 < rsi[-1] < 60:
         return "震荡市场"
-    elif rsi.iloc[-1] > 70:
+    elif rsi[-1] > 70:
         return "超买，可能趋势反转"
-    elif rsi.iloc[-1] < 30:
+    elif rsi[-1] < 30:
         return "超卖，可能趋势反转"
     else:
         return "趋势市场"
 
 def check_macd_market(data):
-    macd, macdsignal, macdhist = talib.MACD(data['close'], fastperiod=12, slowperiod=26, signalperiod=9)
-    if macdhist.iloc[-1] > 0 and macdhist.iloc[-2] <= 0:
+    macd, macdsignal, macdhist = indicators.macd(data['close'], 12, 26, 9)
+    if macdhist[-1] > 0 and macdhist[-2] <= 0:
         return "趋势转向，可能为上升趋势"
-    elif macdhist.iloc[-1] < 0 and macdhist.iloc[-2] >= 0:
+    elif macdhist[-1] < 0 and macdhist[-2] >= 0:
         return "趋势转向，可能为下降趋势"
     else:
         return "震荡市场"
@@ -93,6 +95,7 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='股票市场分析工具')
     parser.add_argument('stock_code', type=str, help='股票代码')
     args = parser.parse_args()
+    settings.load_config(required=False)
 
     stock_code = args.stock_code
     end_date = datetime.now().strftime('%Y%m%d')
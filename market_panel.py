@@ -0,0 +1,236 @@
+# -*- encoding: UTF-8 -*-
+
+import numpy as np
+import pandas as pd
+import utils
+
+# 面板中保存的行情字段
+FIELDS = ['开盘', '收盘', '最高', '最低', '成交量', '成交额', '振幅', '涨跌幅', '涨跌额', '换手率', 'p_change']
+
+
+# 全市场日线面板：values的形状为(股票数, 交易日数, 字段数)，按统一的交易日对齐，缺失的K线（未上市、停牌）为NaN
+# panel['收盘']是(股票数 × 交易日数)的二维视图，可直接做横截面计算；
+# panel.frame(symbol)是单只股票的DataFrame视图，与原来data_fetcher返回的格式一致，不复制数据
+class MarketPanel:
+    # bars为保存二进制面板时记下的(first, last, counts)，见refresh
+    def __init__(self, symbols, dates, values, bars=None):
+        self.symbols = list(symbols)
+        self.dates = np.asarray(dates, dtype='datetime64[D]')
+        self.values = values
+        # 内存映射的二进制面板所在目录（history_store.open_panel），其他情况为None
+        self.source = None
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.date_strings = np.datetime_as_string(self.dates, unit='D').astype(object)
+        months = self.dates.astype('datetime64[M]')
+        self.date_ints = (months.astype('datetime64[Y]').astype(np.int64) + 1970) * 10000 + \
+            (months.astype(np.int64) % 12 + 1) * 100 + (self.dates - months).astype(np.int64) + 1
+
+        self.refresh(bars)
+
+    # 根据values重新计算每只股票第一根、最后一根K线所在的列和K线数，values被原地修改（如写入盘中临时K线）后调用。
+    # 给出bars时直接使用，不读取收盘价：内存映射打开二进制面板时不需要读入全部数据。
+    # valid、positions在第一次用到时才计算
+    def refresh(self, bars=None):
+        self._valid = None
+        self._positions = None
+        self._gaps = None
+        if bars is not None:
+            self.first, self.last, self.counts = (np.asarray(x, dtype=np.int64) for x in bars)
+        else:
+            valid = self.valid
+            counts = valid.sum(axis=1)
+            if valid.shape[1] == 0:
+                # 没有交易日（没有股票或全部获取失败）
+                self.first = np.zeros(len(valid), dtype=np.int64)
+                self.last = np.full(len(valid), -1, dtype=np.int64)
+            else:
+                self.first = np.where(counts > 0, valid.argmax(axis=1), 0)
+                self.last = np.where(counts > 0, valid.shape[1] - 1 - valid[:, ::-1].argmax(axis=1), -1)
+            self.counts = counts
+        # 区间内没有停牌缺口的股票可以直接切片
+        self.contiguous = self.counts == (self.last - self.first + 1)
+
+    # 每个位置是否有K线（收盘价不为NaN），形状(股票数, 交易日数)
+    @property
+    def valid(self):
+        if self._valid is None:
+            self._valid = ~np.isnan(self.values[:, :, FIELDS.index('收盘')])
+        return self._valid
+
+    # 每只股票有效K线所在的列，按时间顺序靠左排列
+    @property
+    def positions(self):
+        if self._positions is None:
+            self._positions = np.argsort(~self.valid, axis=1, kind='stable')
+        return self._positions
+
+    # 有停牌缺口的股票序号，以及这些股票的valid和positions；只读取这些股票的收盘价
+    def gaps(self):
+        if self._gaps is None:
+            rows = np.flatnonzero(~self.contiguous)
+            if self._valid is not None:
+                valid = self._valid[rows]
+            else:
+                valid = ~np.isnan(self.values[rows, :, FIELDS.index('收盘')])
+            self._gaps = rows, valid, np.argsort(~valid, axis=1, kind='stable')
+        return self._gaps
+
+    @classmethod
+    def from_frames(cls, stocks_data, dtype=np.float32):
+        symbols = list(stocks_data.keys())
+        frame_dates = [pd.to_datetime(df['日期']).values.astype('datetime64[D]') for df in stocks_data.values()]
+        dates = np.unique(np.concatenate(frame_dates)) if frame_dates else np.array([], dtype='datetime64[D]')
+
+        values = np.full((len(symbols), len(dates), len(FIELDS)), np.nan, dtype=dtype)
+        for i, (df, df_dates) in enumerate(zip(stocks_data.values(), frame_dates)):
+            positions = np.searchsorted(dates, df_dates)
+            columns = [field for field in FIELDS if field in df.columns]
+            values[i, positions[:, None], [FIELDS.index(field) for field in columns]] = df[columns].to_numpy(dtype=dtype)
+        return cls(symbols, dates, values)
+
+    # 在最后追加一个交易日（全部为NaN），已经包含该交易日时返回自身
+    def with_date(self, date):
+        date = np.datetime64(str(date)[:10], 'D')
+        if len(self.dates) > 0 and self.dates[-1] >= date:
+            return self
+        values = np.concatenate([self.values, np.full((len(self.symbols), 1, len(FIELDS)), np.nan,
+                                                      dtype=self.values.dtype)], axis=1)
+        return MarketPanel(self.symbols, np.append(self.dates, date), values)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self.index
+
+    def __getitem__(self, field):
+        return self.values[:, :, FIELDS.index(field)]
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes
+
+    def keys(self):
+        return iter(self.symbols)
+
+    # 每只股票截至end_date（含）的K线数
+    def bar_counts(self, end_date=None):
+        if end_date is None:
+            return self.counts
+        end = np.searchsorted(self.dates, np.datetime64(str(end_date), 'D'), side='right')
+        # 没有停牌缺口的股票end之前的K线数为end - first，只有缺口股票需要逐列计数
+        counts = np.clip(end - self.first, 0, self.counts)
+        rows, valid, _ = self.gaps()
+        counts[rows] = valid[:, :end].sum(axis=1)
+        return counts
+
+    # 每只股票截至end_date的最近n根K线所在的列，右对齐；不足n根的位置为-1
+    def tail_columns(self, n, end_date=None):
+        index = self.bar_counts(end_date)[:, None] - n + np.arange(n)
+        # 没有停牌缺口的股票第k根K线在first + k列
+        columns = self.first[:, None] + index
+        rows, _, positions = self.gaps()
+        columns[rows] = np.take_along_axis(positions, np.clip(index[rows], 0, None), axis=1)
+        columns[index < 0] = -1
+        return columns
+
+    # 每只股票截至end_date的最近n根K线的某个字段，形状(股票数, n)，右对齐，不足n根的部分为NaN
+    def tail(self, field, n, end_date=None, columns=None):
+        if columns is None:
+            columns = self.tail_columns(n, end_date)
+        result = self.values[np.arange(len(self.symbols))[:, None], columns, FIELDS.index(field)].astype(np.float64)
+        result[columns < 0] = np.nan
+        return result
+
+    def tail_dates(self, n, end_date=None, columns=None):
+        if columns is None:
+            columns = self.tail_columns(n, end_date)
+        result = self.dates[columns]
+        result[columns < 0] = np.datetime64('NaT')
+        return result
+
+    # 每只股票在各交易日（含）之前的最后一根K线，在宽度为n的tail矩阵中所在的列；还没有K线的位置为-1
+    def as_of_columns(self, dates, n):
+        columns = np.searchsorted(self.dates, np.asarray(dates, dtype='datetime64[D]'), side='right') - 1
+        bars = np.cumsum(self.valid, axis=1)[:, np.clip(columns, 0, None)]
+        bars[:, columns < 0] = 0
+        result = n - self.counts[:, None] + bars - 1
+        result[bars == 0] = -1
+        return result
+
+    # 把按K线排列的tail矩阵（股票数 × n）换成按交易日排列（股票数 × 交易日数），取每个交易日（含）之前最后一根K线的值
+    def on_dates(self, matrix, dates):
+        columns = self.as_of_columns(dates, matrix.shape[1])
+        result = np.take_along_axis(matrix, np.clip(columns, 0, None), axis=1)
+        result[columns < 0] = False if result.dtype == bool else np.nan
+        return result
+
+    # 单只股票的DataFrame视图，列与data_fetcher.fetch的返回一致
+    def frame(self, symbol):
+        i = symbol if isinstance(symbol, (int, np.integer)) else self.index[symbol]
+        if self.last[i] < 0:
+            return pd.DataFrame(columns=['日期'] + FIELDS, index=pd.Index([], dtype=np.int64, name=utils.DATE_INDEX))
+        rows = slice(self.first[i], self.last[i] + 1)
+        if self.contiguous[i]:
+            values = self.values[i, rows]
+            dates = self.date_strings[rows]
+            date_ints = self.date_ints[rows]
+        else:
+            values = self.values[i, rows]
+            valid = ~np.isnan(values[:, FIELDS.index('收盘')])
+            values = values[valid]
+            dates = self.date_strings[rows][valid]
+            date_ints = self.date_ints[rows][valid]
+        # 以整数日期为索引，utils.as_of按索引二分查找截取end_date之前的数据
+        df = pd.DataFrame(values, columns=FIELDS, index=pd.Index(date_ints, name=utils.DATE_INDEX), copy=False)
+        df.insert(0, '日期', dates)
+        return df
+
+    # 依次返回(股票, DataFrame视图)，indices指定只遍历其中部分股票
+    def items(self, indices=None):
+        if indices is None:
+            indices = range(len(self.symbols))
+        for i in indices:
+            yield self.symbols[i], self.frame(i)
+
+    def __iter__(self):
+        return self.keys()
+
+
+# 取缓存的中间结果，没有时计算并保存；参数扫描、逐日回测时在多个参数组合之间共享
+def cached(cache, key, compute):
+    if key not in cache:
+        cache[key] = compute()
+    return cache[key]
+
+
+# 沿时间轴（最后一维）右移k根K线，左侧补NaN
+def shift(values, k=1):
+    result = np.full(values.shape, np.nan)
+    result[..., k:] = values[..., :values.shape[-1] - k]
+    return result
+
+
+# 沿时间轴（最后一维）的滚动均值，窗口内有NaN或不足window根时为NaN，与pandas rolling(window).mean()一致
+def rolling_mean(values, window):
+    result = np.full(values.shape, np.nan)
+    if values.shape[-1] >= window:
+        windows = np.lib.stride_tricks.sliding_window_view(values, window, axis=-1)
+        result[..., window - 1:] = windows.mean(axis=-1)
+    return result
+
+
+def rolling_max(values, window):
+    result = np.full(values.shape, np.nan)
+    if values.shape[-1] >= window:
+        windows = np.lib.stride_tricks.sliding_window_view(values, window, axis=-1)
+        result[..., window - 1:] = windows.max(axis=-1)
+    return result
+
+
+def rolling_min(values, window):
+    result = np.full(values.shape, np.nan)
+    if values.shape[-1] >= window:
+        windows = np.lib.stride_tricks.sliding_window_view(values, window, axis=-1)
+        result[..., window - 1:] = windows.min(axis=-1)
+    return result
@@ -0,0 +1,114 @@
+# -*- encoding: UTF-8 -*-
+
+import concurrent.futures
+import contextlib
+import math
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import history_store
+import settings
+from market_panel import MarketPanel
+
+# 子进程中的全局状态，由init_worker设置
+worker = {}
+
+
+# 子进程初始化：挂载共享内存中的行情数据（不复制），保存策略和配置。
+# source为二进制面板目录时直接映射该文件，不经过共享内存
+def init_worker(shm_name, shape, dtype, symbols, dates, strategies, config, top_list, source=None):
+    if source is not None:
+        values = history_store.map_values(source, shape)
+    else:
+        try:
+            shm = shared_memory.SharedMemory(name=shm_name, track=False)
+        except TypeError:
+            # Python 3.13以下没有track参数，子进程与主进程共用同一个resource_tracker，由主进程负责unlink
+            shm = shared_memory.SharedMemory(name=shm_name)
+        values = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        worker['shm'] = shm
+    worker['values'] = values
+    worker['symbols'] = symbols
+    worker['dates'] = dates
+    worker['strategies'] = strategies
+    settings.config = config
+    if top_list is not None:
+        settings.top_list = top_list
+
+
+# 子进程中共享内存上的面板，可以只取一段股票[start, stop)
+def worker_panel(start=0, stop=None):
+    stop = len(worker['symbols']) if stop is None else stop
+    return MarketPanel(worker['symbols'][start:stop], worker['dates'], worker['values'][start:stop])
+
+
+# 计算一段股票[start, stop)的策略命中结果和STTS评分，只返回股票序号和评分
+def evaluate_shard(start, stop, end_date):
+    import work_flow
+    import indicator_cache
+
+    panel = worker_panel(start, stop)
+    hits = work_flow.evaluate(panel, worker['strategies'], end_date)
+
+    results = {}
+    for strategy, stocks_data in hits.items():
+        scores = work_flow.calculate_stts_scores(list(stocks_data.values()))
+        results[strategy] = [(start + panel.index[symbol], score) for symbol, score in zip(stocks_data, scores)]
+    indicator_cache.clear()
+    return results
+
+
+# 有策略用到龙虎榜机构名单时在主进程获取一次，传给子进程；否则不获取
+def top_list(strategies):
+    if any(getattr(strategy_func, 'uses_top_list', False) for strategy_func in (strategies or {}).values()):
+        return settings.top_list
+    return None
+
+
+# 进程池：行情数据只通过共享内存发布一次，子进程用worker_panel()挂载，不复制。
+# 内存映射的二进制面板不需要共享内存，子进程映射同一文件
+@contextlib.contextmanager
+def pool(panel, workers, strategies=None):
+    if panel.source is not None:
+        initargs = (None, panel.values.shape, panel.values.dtype, panel.symbols, panel.dates, strategies or {},
+                    settings.config, top_list(strategies), panel.source)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                                    initargs=initargs) as executor:
+            yield executor
+        return
+
+    shm = shared_memory.SharedMemory(create=True, size=max(panel.values.nbytes, 1))
+    try:
+        values = np.ndarray(panel.values.shape, dtype=panel.values.dtype, buffer=shm.buf)
+        values[:] = panel.values
+        # 复制后立即释放对shm.buf的引用，否则执行出错时shm.close()抛出BufferError，共享内存不会被unlink
+        del values
+        initargs = (shm.name, panel.values.shape, panel.values.dtype, panel.symbols, panel.dates, strategies or {},
+                    settings.config, top_list(strategies))
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                                    initargs=initargs) as executor:
+            yield executor
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+# 多进程执行策略：每个任务只传递股票区间
+# 返回({策略: {股票: DataFrame视图}}, {策略: {股票: STTS评分}})
+def evaluate(panel, strategies, end_date=None, workers=4):
+    chunk = max(1, math.ceil(len(panel) / (workers * 4)))
+    with pool(panel, workers, strategies) as executor:
+        futures = [executor.submit(evaluate_shard, start, min(start + chunk, len(panel)), end_date)
+                   for start in range(0, len(panel), chunk)]
+        shards = [future.result() for future in futures]
+
+    hits = {strategy: {} for strategy in strategies}
+    scores = {strategy: {} for strategy in strategies}
+    for shard in shards:
+        for strategy, results in shard.items():
+            for i, score in results:
+                symbol = panel.symbols[i]
+                hits[strategy][symbol] = panel.frame(i)
+                scores[strategy][symbol] = score
+    return hits, scores
@@ -0,0 +1,144 @@
+# -*- encoding: UTF-8 -*-
+
+import os
+import re
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import data_fetcher
+import settings
+import walk_forward
+
+# 选股结果跟踪：work_flow.save_latest_data_to_file每天保存的{策略}_latest_data_{日期}.csv中的每只股票，
+# 从入选当日收盘买入，之后1、3、5、10、20根K线的收益率，以及20根K线内的最大不利偏移（最低价相对买入价的最大跌幅）。
+# 结果保存在{output}/pick_performance.csv，每次只读取新增或修改过的文件，只计算还没有足够K线的选股
+HORIZONS = walk_forward.HORIZONS
+FILE_PATTERN = re.compile(r'^(.+)_latest_data_(\d{4}-\d{2}-\d{2})\.csv$')
+STATE_FILE = 'pick_performance.csv'
+MAE = '最大不利偏移'
+RETURNS = ['{}日收益率'.format(horizon) for horizon in HORIZONS]
+COLUMNS = ['文件', '文件修改时间', '策略', '日期', '代码'] + RETURNS + [MAE, '完成']
+
+
+# 输出目录中的选股结果文件：{文件名: 修改时间（纳秒，整数在CSV中保存后仍可精确比较）}
+def scan(output_dir):
+    if not os.path.isdir(output_dir):
+        return {}
+    return {name: os.stat(os.path.join(output_dir, name)).st_mtime_ns
+            for name in sorted(os.listdir(output_dir)) if FILE_PATTERN.match(name)}
+
+
+# 读取一个选股结果文件中的选股，每行一次
+def read_picks(output_dir, name, mtime):
+    data = pd.read_csv(os.path.join(output_dir, name), dtype={'股票代码': str, '日期': str})
+    picks = pd.DataFrame({
+        '文件': name,
+        '文件修改时间': mtime,
+        '策略': FILE_PATTERN.match(name).group(1),
+        # 选股当日，即保存的最后一根K线的日期
+        '日期': data['日期'].str[:10],
+        # 保存时股票代码可能是(代码, 名称)的字符串
+        '代码': data['股票代码'].str.extract(r'(\d{6})', expand=False),
+    }, columns=COLUMNS)
+    picks['完成'] = False
+    return picks.dropna(subset=['代码'])
+
+
+# 批量计算选股之后的收益率和最大不利偏移；之后的K线不足时为NaN，K线足够计算全部持有期时完成
+def forward_returns(panel, picks):
+    index = {symbol[0]: i for i, symbol in enumerate(panel.symbols)}
+    rows = np.array([index.get(code, -1) for code in picks['代码']], dtype=np.int64)
+    columns = np.searchsorted(panel.dates, picks['日期'].to_numpy(dtype='datetime64[D]'))
+    columns = np.clip(columns, 0, max(len(panel.dates) - 1, 0))
+    known = (rows >= 0) & (len(panel.dates) > 0)
+    rows = np.where(known, rows, 0)
+    if len(panel.dates) > 0:
+        known &= (panel.dates[columns] == picks['日期'].to_numpy(dtype='datetime64[D]')) & panel.valid[rows, columns]
+
+    result = pd.DataFrame(np.nan, index=picks.index, columns=RETURNS + [MAE])
+    result['完成'] = False
+    if not known.any():
+        return result
+    rows, columns = rows[known], columns[known]
+    # 当日K线是该股票的第几根
+    bars = np.cumsum(panel.valid[rows], axis=1)[np.arange(len(rows)), columns] - 1
+    counts = panel.counts[rows]
+    positions = panel.positions[rows]
+    close = panel['收盘'][rows].astype(np.float64)
+    low = panel['最低'][rows].astype(np.float64)
+    k = np.arange(len(rows))[:, None]
+    entry = close[k[:, 0], columns]
+
+    returns = {}
+    for horizon, column in zip(HORIZONS, RETURNS):
+        exits = bars + horizon
+        price = close[k[:, 0], positions[k[:, 0], np.clip(exits, 0, positions.shape[1] - 1)]]
+        returns[column] = np.where(exits < counts, price / entry - 1, np.nan)
+
+    window = bars[:, None] + np.arange(1, max(HORIZONS) + 1)
+    available = window < counts[:, None]
+    lows = np.where(available, low[k, positions[k, np.clip(window, 0, positions.shape[1] - 1)]], np.inf).min(axis=1)
+    returns[MAE] = np.where(available.any(axis=1), np.minimum(lows / entry - 1, 0), np.nan)
+    returns['完成'] = available.all(axis=1)
+
+    for column, values in returns.items():
+        result.loc[picks.index[known], column] = values
+    return result
+
+
+def load_state(output_dir):
+    file_path = os.path.join(output_dir, STATE_FILE)
+    if not os.path.exists(file_path):
+        return pd.DataFrame(columns=COLUMNS)
+    return pd.read_csv(file_path, dtype={'代码': str, '日期': str})
+
+
+# 增量更新：新增或修改过的文件重新读取，已删除的文件去掉，只对未完成的选股读取本地历史数据计算
+def update(output_dir='output'):
+    state = load_state(output_dir)
+    files = scan(output_dir)
+    known = state.groupby('文件')['文件修改时间'].first().to_dict() if len(state) else {}
+    changed = [name for name, mtime in files.items() if known.get(name) != mtime]
+    state = state[state['文件'].isin(list(files)) & ~state['文件'].isin(changed)]
+    picks = [read_picks(output_dir, name, files[name]) for name in changed]
+    state = pd.concat([state] + picks, ignore_index=True) if picks else state.reset_index(drop=True)
+    state['完成'] = state['完成'].astype(bool)
+
+    pending = state.index[~state['完成']]
+    if len(pending):
+        codes = sorted(state.loc[pending, '代码'].unique())
+        panel = data_fetcher.load([(code, code) for code in codes])
+        state.loc[pending, RETURNS + [MAE, '完成']] = forward_returns(panel, state.loc[pending])
+        state['完成'] = state['完成'].astype(bool)
+
+    state = state.sort_values(['策略', '日期', '代码'], ignore_index=True)
+    os.makedirs(output_dir, exist_ok=True)
+    state.to_csv(os.path.join(output_dir, STATE_FILE), index=False, encoding='utf-8-sig')
+    return state
+
+
+# 按策略汇总：选股次数，各持有期的平均收益率和胜率，平均最大不利偏移
+def summary(state):
+    result = walk_forward.summary(state, HORIZONS)
+    result['平均' + MAE] = state.groupby('策略', sort=False)[MAE].mean()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='跟踪选股结果之后的收益率')
+    parser.add_argument('--output', default='output', help='选股结果所在目录')
+    args = parser.parse_args()
+
+    settings.load_config(required=False)
+    try:
+        state = update(args.output)
+    except data_fetcher.HistoryDisabled as error:
+        parser.error(str(error))
+    print(summary(state).to_string())
+    print("选股明细已保存到文件：{}".format(os.path.join(args.output, STATE_FILE)))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,12 @@
 
 import logging
 import settings
-from wxpusher import WxPusher
 
 
 def push(msg):
     if settings.config['push']['enable']:
+        # wxpusher只在开启推送时导入
+        from wxpusher import WxPusher
         response = WxPusher.send_message(msg, uids=[settings.config['push']['wxpusher_uid']],
                                          token=settings.config['push']['wxpusher_token'])
         print(response)
@@ -1,20 +1,69 @@
 # -*- encoding: UTF-8 -*-
 import yaml
 import os
-import akshare as ak
+import json
+import datetime
+import gateway
 
+TOP_LIST_FILE = 'top_list.json'
+# {日期: 龙虎榜机构名单}，只保留当天
+top_lists = {}
 
-def init():
+
+# 只读取config.yaml，不访问网络；命令行工具没有config.yaml时使用默认配置
+def load_config(required=True):
     global config
-    global top_list
     root_dir = os.path.dirname(os.path.abspath(__file__))  # This is your Project Root
     config_file = os.path.join(root_dir, 'config.yaml')
+    if not required and not os.path.exists(config_file):
+        config = {}
+        return config
     with open(config_file, 'r') as file:
         config = yaml.safe_load(file)
-    df = ak.stock_lhb_stock_statistic_em(symbol="近三月")
+    return config
+
+
+# 启动时只读取配置；龙虎榜机构名单top_list在策略第一次用到时才获取（settings.top_list），每天获取一次
+def init():
+    load_config()
+
+
+# 龙虎榜近三月机构买入次数大于1的股票代码。当天已获取过的直接使用，启用本地存储时保存在{data_dir}/history/top_list.json，
+# 同一天内多次运行、多个进程之间只请求一次
+def load_top_list():
+    import history_store
+
+    today = datetime.date.today().isoformat()
+    if today in top_lists:
+        return top_lists[today]
+    file_path = os.path.join(history_store.root(), TOP_LIST_FILE) if history_store.enabled() else None
+    if file_path and os.path.exists(file_path):
+        with open(file_path, 'r') as file:
+            saved = json.load(file)
+        if saved.get('date') == today:
+            top_lists.clear()
+            top_lists[today] = saved['codes']
+            return saved['codes']
+
+    df = gateway.call('stock_lhb_stock_statistic_em', symbol="近三月")
     mask = (df['买方机构次数'] > 1)  # 机构买入次数大于1
     df = df.loc[mask]
     top_list = df['代码'].tolist()
+    top_lists.clear()
+    top_lists[today] = top_list
+    if file_path:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, 'w') as file:
+            json.dump({'date': today, 'codes': top_list}, file)
+    return top_list
+
+
+# 读取settings.top_list时按当天的名单返回，长时间运行的定时任务每天自动更新；
+# 调用方直接设置了settings.top_list（子进程、测试）时使用设置的值
+def __getattr__(name):
+    if name == 'top_list':
+        return load_top_list()
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
 
 
 def config():
@@ -1,8 +1,11 @@
 # -*- encoding: UTF-8 -*-
 
-import talib as tl
+import numpy as np
 import pandas as pd
 import logging
+import utils
+import indicator_cache
+from market_panel import rolling_mean
 from datetime import datetime, timedelta
 
 
@@ -17,17 +20,12 @@ def check(code_name, data, end_date=None, threshold=60):
     if len(data) < 250:
         logging.debug("{0}:样本小于250天...\n".format(code_name))
         return
-    data['ma250'] = pd.Series(tl.MA(data['收盘'].values, 250), index=data.index.values)
+    data['ma250'] = pd.Series(indicator_cache.get(code_name, data, 'MA', '收盘', 250), index=data.index.values)
 
-    begin_date = data.iloc[0].日期
-    if end_date is not None:
-        if end_date < begin_date:  # 该股票在end_date时还未上市
-            logging.debug("{}在{}时还未上市".format(code_name, end_date))
-            return False
-
-    if end_date is not None:
-        mask = (data['日期'] <= end_date)
-        data = data.loc[mask]
+    data = utils.as_of(data, end_date)
+    if data.empty:  # 该股票在end_date时还未上市
+        logging.debug("{}在{}时还未上市".format(code_name, end_date))
+        return False
 
     data = data.tail(n=threshold)
 
@@ -83,3 +81,44 @@ def check(code_name, data, end_date=None, threshold=60):
 
     return True
 
+
+def check_panel(panel, end_date=None, threshold=60):
+    columns = panel.tail_columns(threshold + 249, end_date)
+    ma250 = rolling_mean(panel.tail('收盘', threshold + 249, columns=columns), 250)[:, 249:]
+    columns = columns[:, 249:]
+    close = panel.tail('收盘', threshold, columns=columns)
+    volume = panel.tail('成交量', threshold, columns=columns)
+    dates = panel.tail_dates(threshold, columns=columns)
+    rows = np.arange(len(panel))
+    positions = np.arange(threshold)
+    last_close = close[:, -1]
+
+    # 区间最高点、最低点（与check中逐行比较的结果一致：严格大于/小于最后一天才会更新）
+    highest = np.where(close.max(axis=1) > last_close, close.argmax(axis=1), threshold - 1)
+    lowest = np.where(close.min(axis=1) < last_close, close.argmin(axis=1), threshold - 1)
+    highest_close = close[rows, highest]
+
+    # 前半段由年线以下向上突破
+    front = highest > 0
+    front_last = np.maximum(highest - 1, 0)
+    breakthrough = (close[:, 0] < ma250[:, 0]) & (close[rows, front_last] > ma250[rows, front_last])
+
+    # 后半段必须在年线以上运行（回踩年线）
+    end = positions >= highest[:, None]
+    above = ~(end & (close < ma250)).any(axis=1)
+    end_close = np.where(end, close, np.inf)
+    recent_lowest = np.where(end_close.min(axis=1) < last_close, end_close.argmin(axis=1), threshold - 1)
+    recent_lowest_close = close[rows, recent_lowest]
+
+    date_diff = (dates[rows, recent_lowest] - dates[rows, highest]).astype('timedelta64[D]').astype(int)
+    vol_ratio = volume[rows, highest] / volume[rows, recent_lowest]
+    back_ratio = recent_lowest_close / highest_close
+
+    return (panel.counts >= 250) & (panel.bar_counts(end_date) >= threshold) & \
+        (volume[rows, lowest] != 0) & (volume[rows, highest] != 0) & front & breakthrough & above & \
+        (10 <= date_diff) & (date_diff <= 50) & (vol_ratio > 2) & (back_ratio < 0.8)
+
+
+check.vectorized = check_panel
+# 默认参数下需要的K线数：年线 + 最近threshold根K线
+check.lookback = 250 + 60
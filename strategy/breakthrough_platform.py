@@ -1,47 +1,66 @@
 # -*- encoding: UTF-8 -*-
 
-import talib as tl
-import pandas as pd
+import numpy as np
 import logging
-from strategy import enter
+import utils
+import indicator_cache
+from market_panel import rolling_mean
 
 
 # 平台突破策略
+# 放量突破60日均线，且最后一个突破日之前的K线都在60日均线附近
+# 均线、量比和突破条件对整个区间一次算出，耗时与K线数成线性关系
 def check(code_name, data, end_date=None, threshold=60):
-    origin_data = data
     if len(data) < threshold:
         logging.debug("{0}:样本小于{1}天...\n".format(code_name, threshold))
         return
-    data['ma60'] = pd.Series(tl.MA(data['收盘'].values, 60), index=data.index.values)
+    ma60 = indicator_cache.get(code_name, data, 'MA', '收盘', 60)
+    # 突破日前一天的5日均量（enter.check_volume）
+    prev_vol_ma5 = np.concatenate([[np.nan], indicator_cache.get(code_name, data, 'MA', '成交量', 5)[:-1]])
 
-    if end_date is not None:
-        mask = (data['日期'] <= end_date)
-        data = data.loc[mask]
-
-    data = data.tail(n=threshold)
-
-    breakthrough_row = None
-
-    for index, row in data.iterrows():
-        if row['开盘'] < row['ma60'] <= row['收盘']:
-            if enter.check_volume(code_name, origin_data, row['日期'], threshold):
-                breakthrough_row = row
-
-    if breakthrough_row is None:
+    data = utils.as_of(data, end_date)
+    if data.empty:
         return False
-
-    data_front = data.loc[(data['日期'] < breakthrough_row['日期'])]
-    data_end = data.loc[(data['日期'] >= breakthrough_row['日期'])]
-
-    for index, row in data_front.iterrows():
-        if not (-0.05 < (row['ma60'] - row['收盘']) / row['ma60'] < 0.2):
-            return False
-
-    return True
-
-
-
-
-
-
-
+    bars = len(data)
+    data = data.tail(n=threshold)
+    rows = slice(bars - len(data), bars)
+
+    return bool(breakthrough(data['开盘'].values, data['收盘'].values, ma60[rows], data['成交量'].values,
+                             prev_vol_ma5[rows], data['p_change'].values, np.arange(rows.start, rows.stop) + 1,
+                             threshold))
+
+
+# 逐根判断是否放量突破60日均线（enter.check_volume），并要求最后一个突破日之前的K线都在60日均线附近，沿最后一维计算
+# bars为截至每根K线（含）的K线数，prev_vol_ma5为前一日的5日均量
+def breakthrough(open_, close, ma60, volume, prev_vol_ma5, p_change, bars, threshold):
+    volume_up = (bars >= threshold + 1) & ~(p_change < 2) & ~(close < open_) & \
+        ~(close * volume * 100 < 200000000) & (volume / prev_vol_ma5 >= 2)
+    crossed = (open_ < ma60) & (ma60 <= close) & volume_up
+
+    days = crossed.shape[-1]
+    last = days - 1 - np.argmax(crossed[..., ::-1], axis=-1)
+    near_ma60 = (-0.05 < (ma60 - close) / ma60) & ((ma60 - close) / ma60 < 0.2)
+    front = np.arange(days) < np.expand_dims(last, -1)
+    return crossed.any(axis=-1) & ~(front & ~near_ma60).any(axis=-1)
+
+
+def check_panel(panel, end_date=None, threshold=60):
+    columns = panel.tail_columns(threshold + 59, end_date)
+    ma60 = rolling_mean(panel.tail('收盘', threshold + 59, columns=columns), 60)[:, 59:]
+    volume = panel.tail('成交量', threshold + 5, columns=columns[:, 54:])
+    prev_vol_ma5 = rolling_mean(volume, 5)[:, 4:-1]
+    volume = volume[:, 5:]
+    columns = columns[:, 59:]
+    close = panel.tail('收盘', threshold, columns=columns)
+    open_ = panel.tail('开盘', threshold, columns=columns)
+    p_change = panel.tail('p_change', threshold, columns=columns)
+
+    # 第k根K线之前（含）的K线数
+    bars = panel.bar_counts(end_date)[:, None] - threshold + 1 + np.arange(threshold)
+    hit = breakthrough(open_, close, ma60, volume, prev_vol_ma5, p_change, bars, threshold)
+    return (panel.counts >= threshold) & hit
+
+
+check.vectorized = check_panel
+# 默认参数下需要的K线数：60日均线 + 最近threshold根K线
+check.lookback = 60 + 60
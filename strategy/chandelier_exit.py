@@ -2,16 +2,52 @@
 
 import numpy as np
 import pandas as pd
+import utils
+from market_panel import cached, shift, rolling_mean, rolling_max, rolling_min
 
 
 def calculate_atr(high, low, close, length=14):
-    tr = np.maximum(high - low, np.abs(high - close.shift(1)), np.abs(low - close.shift(1)))
+    tr = true_range(high, low, close)
     atr = tr.rolling(window=length).mean()
     print(f"计算得到的 ATR: {atr.tail()}")
     return atr
 
+# 真实波幅：当日最高最低价之差、最高价与前收盘价之差、最低价与前收盘价之差三者绝对值的最大值；第一根K线没有前收盘价，为最高价减最低价
 def true_range(high, low, close):
-    return np.maximum(high - low, np.abs(high - close.shift(1)), np.abs(low - close.shift(1)))
+    return pd.concat([high - low, (high - close.shift(1)).abs(), (low - close.shift(1)).abs()], axis=1).max(axis=1)
+
+
+# 面板版本的真实波幅，输入为二维数组（股票数 × K线数）
+def true_range_panel(high, low, close):
+    previous = shift(close)
+    return np.fmax(np.fmax(high - low, np.abs(high - previous)), np.abs(low - previous))
+
+
+# 吊灯止损的递推：前一日收盘价高于前一日多头止损价时，多头止损价只升不降；前一日收盘价低于前一日空头止损价时，空头止损价只降不升。
+# 方向：收盘价突破前一日空头止损价为1，跌破前一日多头止损价为-1，否则沿用前一日方向，初始为1。
+# 输入为未递推的多空止损价，二维数组（股票数 × K线数，左侧可以用NaN补齐）按时间逐列递推、全部股票一起计算，一维数组视为一只股票。
+# 返回(多头止损价, 空头止损价, 方向)
+def trailing_stops(close, long_stop, short_stop):
+    shape = np.shape(close)
+    # 转置后每根K线的全部股票在内存中连续
+    close = np.atleast_2d(close).T
+    long_stop = np.atleast_2d(long_stop).T.copy()
+    short_stop = np.atleast_2d(short_stop).T.copy()
+    direction = np.ones(close.shape, dtype=np.int8)
+
+    long_prev, short_prev, dir_prev = long_stop[0], short_stop[0], direction[0]
+    for t in range(close.shape[0]):
+        # 前一日止损价为NaN时用当日止损价代替
+        long_prev = np.where(np.isnan(long_prev), long_stop[t], long_prev)
+        short_prev = np.where(np.isnan(short_prev), short_stop[t], short_prev)
+        if t > 0:
+            long_stop[t] = np.where(close[t - 1] > long_prev, np.maximum(long_stop[t], long_prev), long_stop[t])
+            short_stop[t] = np.where(close[t - 1] < short_prev, np.minimum(short_stop[t], short_prev), short_stop[t])
+        direction[t] = np.where(close[t] > short_prev, 1, np.where(close[t] < long_prev, -1, dir_prev))
+        long_prev, short_prev, dir_prev = long_stop[t], short_stop[t], direction[t]
+
+    return long_stop.T.reshape(shape), short_stop.T.reshape(shape), direction.T.reshape(shape)
+
 
 def chandelier_exit(data, length=14, mult=2, use_close=True):
     print(f"开始计算 Chandelier Exit, 参数: length={length}, mult={mult}, use_close={use_close}")
@@ -29,19 +65,17 @@ def chandelier_exit(data, length=14, mult=2, use_close=True):
         data['highest'] = data['最高'].rolling(window=length).max()
         data['lowest'] = data['最低'].rolling(window=length).min()
     
-    data['Long_Stop'] = data['highest'] - (mult * data['ATR'])
-    data['Short_Stop'] = data['lowest'] + (mult * data['ATR'])
+    long_stop, short_stop, direction = trailing_stops(
+        data['收盘'].to_numpy(dtype=np.float64),
+        (data['highest'] - (mult * data['ATR'])).to_numpy(dtype=np.float64),
+        (data['lowest'] + (mult * data['ATR'])).to_numpy(dtype=np.float64))
+    data['Long_Stop'] = long_stop
+    data['Short_Stop'] = short_stop
     
     print(f"计算得到的 Long_Stop: {data['Long_Stop'].tail()}")
     print(f"计算得到的 Short_Stop: {data['Short_Stop'].tail()}")
     
-    data['Direction'] = np.select(
-        [data['收盘'] > data['Short_Stop'].shift(1), data['收盘'] < data['Long_Stop'].shift(1)],
-        [1, -1],
-        default=0
-    )
-    
-    data['Direction'] = data['Direction'].replace(0).ffill()
+    data['Direction'] = direction
     
     # 添加20日均线计算
     data['20日均线'] = data['收盘'].rolling(window=20).mean()
@@ -57,8 +91,7 @@ def chandelier_exit(data, length=14, mult=2, use_close=True):
 def check_enter(code_name, data, end_date=None, length=14, mult=2.0, use_close=True):
     print(f"开始检查股票 {code_name} 是否满足进场条件")
     
-    if end_date:
-        data = data[data['时间'] <= end_date]
+    data = utils.as_of(data, end_date)
     
     if len(data) < length + 1:
         print(f"股票 {code_name} 数据不足，无法进行分析")
@@ -72,3 +105,56 @@ def check_enter(code_name, data, end_date=None, length=14, mult=2.0, use_close=T
 
     print(f"股票 {code_name} 在最后一个交易日没有产生买入信号")
     return False
+
+
+def check_enter_panel(panel, end_date=None, length=14, mult=2.0, use_close=True):
+    counts = panel.bar_counts(end_date)
+    n = max(int(counts.max(initial=0)), 2)
+    columns = panel.tail_columns(n, end_date)
+    high = panel.tail('最高', n, columns=columns)
+    low = panel.tail('最低', n, columns=columns)
+    close = panel.tail('收盘', n, columns=columns)
+
+    tr = true_range_panel(high, low, close)
+    atr = rolling_mean(tr, length)
+    if use_close:
+        highest, lowest = rolling_max(close, length), rolling_min(close, length)
+    else:
+        highest, lowest = rolling_max(high, length), rolling_min(low, length)
+    _, _, direction = trailing_stops(close, highest - mult * atr, lowest + mult * atr)
+
+    ma20 = rolling_mean(close, 20)
+    buy_signal = (direction[:, -1] == 1) & (direction[:, -2] == -1) & (close[:, -1] > ma20[:, -1])
+    return (counts >= length + 1) & buy_signal
+
+
+# 每个交易日的买入信号（股票数 × 交易日数），与逐日调用check_enter_panel的结果一致。
+# 全部历史只计算一次；真实波幅、ATR、区间最高最低价和20日均线保存在cache中，供不同参数组合共享
+def check_enter_signals(panel, dates, cache=None, length=14, mult=2.0, use_close=True):
+    cache = {} if cache is None else cache
+    n = max(int(panel.counts.max(initial=0)), 2)
+    high = cached(cache, ('最高', n), lambda: panel.tail('最高', n))
+    low = cached(cache, ('最低', n), lambda: panel.tail('最低', n))
+    close = cached(cache, ('收盘', n), lambda: panel.tail('收盘', n))
+
+    tr = cached(cache, ('TR', n), lambda: true_range_panel(high, low, close))
+    atr = cached(cache, ('ATR', n, length), lambda: rolling_mean(tr, length))
+    if use_close:
+        highest = cached(cache, ('max', '收盘', n, length), lambda: rolling_max(close, length))
+        lowest = cached(cache, ('min', '收盘', n, length), lambda: rolling_min(close, length))
+    else:
+        highest = cached(cache, ('max', '最高', n, length), lambda: rolling_max(high, length))
+        lowest = cached(cache, ('min', '最低', n, length), lambda: rolling_min(low, length))
+    _, _, direction = trailing_stops(close, highest - mult * atr, lowest + mult * atr)
+
+    ma20 = cached(cache, ('MA', '收盘', n, 20), lambda: rolling_mean(close, 20))
+    # 每一列是该股票的第几根K线
+    bars = np.arange(n) - (n - panel.counts[:, None]) + 1
+    buy_signal = (direction == 1) & (shift(direction) == -1) & (close > ma20) & (bars >= length + 1)
+    return panel.on_dates(buy_signal, dates)
+
+
+check_enter.vectorized = check_enter_panel
+# 默认参数下需要的K线数：20日均线，止损价和方向的递推另需约100根K线预热
+check_enter.lookback = 20 + 100
+check_enter.signal_matrix = check_enter_signals
@@ -1,8 +1,9 @@
 # -*- encoding: UTF-8 -*-
 
-import talib as tl
 import pandas as pd
 import logging
+import utils
+import indicator_cache
 
 
 def check(code_name, data, end_date=None, threshold=60):
@@ -10,11 +11,9 @@ def check(code_name, data, end_date=None, threshold=60):
         logging.debug("{0}:样本小于250天...\n".format(code_name))
         return False
 
-    data['vol_ma5'] = pd.Series(tl.MA(data['成交量'].values, 5), index=data.index.values)
+    data['vol_ma5'] = pd.Series(indicator_cache.get(code_name, data, 'MA', '成交量', 5), index=data.index.values)
 
-    if end_date is not None:
-        mask = (data['日期'] <= end_date)
-        data = data.loc[mask]
+    data = utils.as_of(data, end_date)
     if data.empty:
         return False
     p_change = data.iloc[-1]['p_change']
@@ -49,3 +48,27 @@ def check(code_name, data, end_date=None, threshold=60):
     else:
         return False
 
+
+def check_panel(panel, end_date=None, threshold=60):
+    columns = panel.tail_columns(6, end_date)
+    volume = panel.tail('成交量', 6, columns=columns)
+    last_close = panel.tail('收盘', 1, columns=columns[:, -1:])[:, 0]
+    p_change = panel.tail('p_change', 1, columns=columns[:, -1:])[:, 0]
+    last_vol = volume[:, -1]
+    mean_vol = volume[:, :-1].mean(axis=1)
+
+    return (panel.counts >= threshold) & (panel.bar_counts(end_date) >= threshold + 1) & \
+        ~(p_change > -9.5) & ~(last_close * last_vol * 100 < 200000000) & (last_vol / mean_vol >= 4)
+
+
+check.vectorized = check_panel
+# 默认参数下需要的K线数：最近threshold + 1根K线 + 5日均量
+check.lookback = 60 + 1 + 5
+
+
+# 快照预筛：当日跌停且成交额不低于2亿
+def check_snapshot(snapshot):
+    return (snapshot['涨跌幅'] <= -9.5) & (snapshot['最新价'] * snapshot['成交量'] * 100 >= 200000000)
+
+
+check.snapshot_filter = check_snapshot
@@ -1,17 +1,17 @@
 # -*- encoding: UTF-8 -*-
 
-import talib as tl
+import numpy as np
 import pandas as pd
 import logging
+import utils
+import indicator_cache
 
 
 # TODO 真实波动幅度（ATR）放大
 # 最后一个交易日收市价从下向上突破指定区间内最高价
 def check_breakthrough(code_name, data, end_date=None, threshold=30):
     max_price = 0
-    if end_date is not None:
-        mask = (data['日期'] <= end_date)
-        data = data.loc[mask]
+    data = utils.as_of(data, end_date)
     data = data.tail(n=threshold+1)
     if len(data) < threshold + 1:
         logging.debug("{0}:样本小于{1}天...\n".format(code_name, threshold))
@@ -35,6 +35,21 @@ def check_breakthrough(code_name, data, end_date=None, threshold=30):
         return False
 
 
+def check_breakthrough_panel(panel, end_date=None, threshold=30):
+    columns = panel.tail_columns(threshold + 1, end_date)
+    close = panel.tail('收盘', threshold + 1, columns=columns)
+    last_open = panel.tail('开盘', 1, columns=columns[:, -1:])[:, 0]
+    last_close = close[:, -1]
+    max_price = np.fmax(np.nanmax(np.where(np.isnan(close[:, :-1]), 0, close[:, :-1]), axis=1), 0)
+    return (panel.bar_counts(end_date) >= threshold + 1) & (last_close > max_price) & \
+        (max_price > close[:, -2]) & (max_price > last_open) & (last_close / last_open > 1.06)
+
+
+check_breakthrough.vectorized = check_breakthrough_panel
+# 默认参数下需要的K线数：最近threshold + 1根K线
+check_breakthrough.lookback = 30 + 1
+
+
 # 收盘价高于N日均线
 def check_ma(code_name, data, end_date=None, ma_days=250):
     if data is None or len(data) < ma_days:
@@ -42,11 +57,9 @@ def check_ma(code_name, data, end_date=None, ma_days=250):
         return False
 
     ma_tag = 'ma' + str(ma_days)
-    data[ma_tag] = pd.Series(tl.MA(data['收盘'].values, ma_days), index=data.index.values)
+    data[ma_tag] = pd.Series(indicator_cache.get(code_name, data, 'MA', '收盘', ma_days), index=data.index.values)
 
-    if end_date is not None:
-        mask = (data['日期'] <= end_date)
-        data = data.loc[mask]
+    data = utils.as_of(data, end_date)
 
     last_close = data.iloc[-1]['收盘']
     last_ma = data.iloc[-1][ma_tag]
@@ -56,6 +69,16 @@ def check_ma(code_name, data, end_date=None, ma_days=250):
         return False
 
 
+def check_ma_panel(panel, end_date=None, ma_days=250):
+    close = panel.tail('收盘', ma_days, end_date)
+    return (panel.counts >= ma_days) & (close[:, -1] > close.mean(axis=1))
+
+
+check_ma.vectorized = check_ma_panel
+# 默认参数下需要的K线数：ma_days日均线
+check_ma.lookback = 250
+
+
 # 上市日小于60天
 def check_new(code_name, data, end_date=None, threshold=60):
     size = len(data.index)
@@ -65,6 +88,15 @@ def check_new(code_name, data, end_date=None, threshold=60):
         return False
 
 
+def check_new_panel(panel, end_date=None, threshold=60):
+    return panel.counts < threshold
+
+
+check_new.vectorized = check_new_panel
+# 默认参数下需要的K线数：K线数不足threshold为新股
+check_new.lookback = 60
+
+
 # 量比大于2
 # 例如：
 #   2017-09-26 2019-02-11 京东方A
@@ -76,11 +108,9 @@ def check_volume(code_name, data, end_date=None, threshold=60):
     if len(data) < threshold:
         logging.debug("{0}:样本小于250天...\n".format(code_name))
         return False
-    data['vol_ma5'] = pd.Series(tl.MA(data['成交量'].values, 5), index=data.index.values)
+    data['vol_ma5'] = pd.Series(indicator_cache.get(code_name, data, 'MA', '成交量', 5), index=data.index.values)
 
-    if end_date is not None:
-        mask = (data['日期'] <= end_date)
-        data = data.loc[mask]
+    data = utils.as_of(data, end_date)
     if data.empty:
         return False
     p_change = data.iloc[-1]['p_change']
@@ -116,14 +146,42 @@ def check_volume(code_name, data, end_date=None, threshold=60):
         return False
 
 
+# 快照预筛：当日涨幅不低于2%、收阳、成交额不低于2亿（与check_volume对最后一个交易日的判断一致）
+def check_volume_snapshot(snapshot):
+    return (snapshot['涨跌幅'] >= 2) & (snapshot['最新价'] >= snapshot['今开']) & \
+        (snapshot['最新价'] * snapshot['成交量'] * 100 >= 200000000)
+
+
+check_volume.snapshot_filter = check_volume_snapshot
+
+
+# 向量化版本：一次计算全市场，返回每只股票是否命中的布尔数组
+def check_volume_panel(panel, end_date=None, threshold=60):
+    columns = panel.tail_columns(6, end_date)
+    volume = panel.tail('成交量', 6, columns=columns)
+    last = columns[:, -1:]
+    last_close = panel.tail('收盘', 1, columns=last)[:, 0]
+    last_open = panel.tail('开盘', 1, columns=last)[:, 0]
+    p_change = panel.tail('p_change', 1, columns=last)[:, 0]
+    last_vol = volume[:, -1]
+    mean_vol = volume[:, :-1].mean(axis=1)
+
+    return (panel.counts >= threshold) & (panel.bar_counts(end_date) >= threshold + 1) & \
+        ~(p_change < 2) & ~(last_close < last_open) & \
+        ~(last_close * last_vol * 100 < 200000000) & (last_vol / mean_vol >= 2)
+
+
+check_volume.vectorized = check_volume_panel
+# 默认参数下需要的K线数：最近threshold根K线 + 5日均量
+check_volume.lookback = 60 + 5
+
+
 # 量比大于3.0
 def check_continuous_volume(code_name, data, end_date=None, threshold=60, window_size=3):
     stock = code_name[0]
     name = code_name[1]
-    data['vol_ma5'] = pd.Series(tl.MA(data['成交量'].values, 5), index=data.index.values)
-    if end_date is not None:
-        mask = (data['日期'] <= end_date)
-        data = data.loc[mask]
+    data['vol_ma5'] = pd.Series(indicator_cache.get(code_name, data, 'MA', '成交量', 5), index=data.index.values)
+    data = utils.as_of(data, end_date)
     data = data.tail(n=threshold + window_size)
     if len(data) < threshold + window_size:
         logging.debug("{0}:样本小于{1}天...\n".format(code_name, threshold+window_size))
@@ -146,3 +204,15 @@ def check_continuous_volume(code_name, data, end_date=None, threshold=60, window
     msg = "*{0} 量比：{1:.2f}\n\t收盘价：{2}\n".format(code_name, last_vol/mean_vol, last_close)
     logging.debug(msg)
     return True
+
+
+def check_continuous_volume_panel(panel, end_date=None, threshold=60, window_size=3):
+    volume = panel.tail('成交量', window_size + 5, end_date)
+    mean_vol = volume[:, :5].mean(axis=1)
+    hit = (volume[:, 5:] / mean_vol[:, None] >= 3.0).all(axis=1)
+    return (panel.bar_counts(end_date) >= threshold + window_size) & hit
+
+
+check_continuous_volume.vectorized = check_continuous_volume_panel
+# 默认参数下需要的K线数：最近threshold + window_size根K线 + 5日均量
+check_continuous_volume.lookback = 60 + 3 + 5
@@ -1,5 +1,7 @@
 # -*- encoding: UTF-8 -*-
 import logging
+import utils
+import numpy as np
 import settings
 
 
@@ -9,9 +11,7 @@ def check(code_name, data, end_date=None, threshold=60):
     if code_name[0] not in settings.top_list:
         return False
 
-    if end_date is not None:
-        mask = (data['日期'] <= end_date)
-        data = data.loc[mask]
+    data = utils.as_of(data, end_date)
     data = data.tail(n=threshold)
 
     if len(data) < threshold:
@@ -36,3 +36,31 @@ def check(code_name, data, end_date=None, threshold=60):
             previous_p_change = 0.0
 
     return False
+
+
+def check_panel(panel, end_date=None, threshold=60):
+    columns = panel.tail_columns(14, end_date)
+    low = panel.tail('最低', 14, columns=columns)
+    high = panel.tail('最高', 1, columns=columns[:, -1:])[:, 0]
+    p_change = panel.tail('p_change', 14, columns=columns)
+    top_list = set(settings.top_list)
+    in_top_list = np.array([symbol[0] in top_list for symbol in panel.symbols], dtype=bool)
+    # 连续两天涨幅大于等于10%
+    limit_up = p_change >= 9.5
+    return in_top_list & (panel.bar_counts(end_date) >= threshold) & ~(high / low.min(axis=1) < 1.9) & \
+        (limit_up[:, 1:] & limit_up[:, :-1]).any(axis=1)
+
+
+check.vectorized = check_panel
+# 默认参数下需要的K线数：最近threshold根K线
+check.lookback = 60
+
+
+# 快照预筛：龙虎榜上必须有机构
+def check_snapshot(snapshot):
+    return snapshot['代码'].isin(settings.top_list)
+
+
+check.snapshot_filter = check_snapshot
+# 需要龙虎榜机构名单settings.top_list，多进程执行时由主进程获取后传给子进程
+check.uses_top_list = True
@@ -1,8 +1,10 @@
 # -*- encoding: UTF-8 -*-
 
-import talib as tl
 import pandas as pd
 import logging
+import utils
+import indicator_cache
+from market_panel import cached, shift, rolling_mean
 
 
 # 持续上涨（MA30向上）
@@ -10,11 +12,9 @@ def check(code_name, data, end_date=None, threshold=30):
     if len(data) < threshold:
         logging.debug("{0}:样本小于{1}天...\n".format(code_name, threshold))
         return
-    data['ma30'] = pd.Series(tl.MA(data['收盘'].values, 30), index=data.index.values)
+    data['ma30'] = pd.Series(indicator_cache.get(code_name, data, 'MA', '收盘', 30), index=data.index.values)
 
-    if end_date is not None:
-        mask = (data['日期'] <= end_date)
-        data = data.loc[mask]
+    data = utils.as_of(data, end_date)
 
     data = data.tail(n=threshold)
 
@@ -27,3 +27,32 @@ def check(code_name, data, end_date=None, threshold=30):
     else:
         return False
 
+
+def check_panel(panel, end_date=None, threshold=30):
+    ma30 = rolling_mean(panel.tail('收盘', threshold + 29, end_date), 30)[:, 29:]
+    step1 = round(threshold/3)
+    step2 = round(threshold*2/3)
+    return (panel.counts >= threshold) & (ma30[:, 0] < ma30[:, step1]) & (ma30[:, step1] < ma30[:, step2]) & \
+        (ma30[:, step2] < ma30[:, -1]) & (ma30[:, -1] > 1.2*ma30[:, 0])
+
+
+# 每个交易日的信号（股票数 × 交易日数），30日均线对全部历史只计算一次并保存在cache中
+def check_signals(panel, dates, cache=None, threshold=30):
+    cache = {} if cache is None else cache
+    n = max(int(panel.counts.max(initial=0)), 1)
+    close = cached(cache, ('收盘', n), lambda: panel.tail('收盘', n))
+    ma30 = cached(cache, ('MA', '收盘', n, 30), lambda: rolling_mean(close, 30))
+    step1 = round(threshold/3)
+    step2 = round(threshold*2/3)
+    # tail(threshold)中第0、step1、step2根K线的30日均线
+    first = shift(ma30, threshold - 1)
+    middle1 = shift(ma30, threshold - 1 - step1)
+    middle2 = shift(ma30, threshold - 1 - step2)
+    hit = (first < middle1) & (middle1 < middle2) & (middle2 < ma30) & (ma30 > 1.2*first)
+    return (panel.counts >= threshold)[:, None] & panel.on_dates(hit, dates)
+
+
+check.vectorized = check_panel
+# 默认参数下需要的K线数：最近threshold根K线 + 30日均线
+check.lookback = 30 + 30
+check.signal_matrix = check_signals
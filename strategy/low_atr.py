@@ -1,7 +1,9 @@
 # -*- encoding: UTF-8 -*-
+import numpy as np
 import pandas as pd
-import talib as tl
 import logging
+import utils
+import indicator_cache
 
 
 # 低ATR成长策略
@@ -12,12 +14,10 @@ def check_low_increase(code_name, data, end_date=None, ma_short=30, ma_long=250,
         logging.debug("{0}:样本小于{1}天...\n".format(code_name, ma_long))
         return False
 
-    data['ma_short'] = pd.Series(tl.MA(data['收盘'].values, ma_short), index=data.index.values)
-    data['ma_long'] = pd.Series(tl.MA(data['收盘'].values, ma_long), index=data.index.values)
+    data['ma_short'] = pd.Series(indicator_cache.get(code_name, data, 'MA', '收盘', ma_short), index=data.index.values)
+    data['ma_long'] = pd.Series(indicator_cache.get(code_name, data, 'MA', '收盘', ma_long), index=data.index.values)
 
-    if end_date is not None:
-        mask = (data['日期'] <= end_date)
-        data = data.loc[mask]
+    data = utils.as_of(data, end_date)
     data = data.tail(n=threshold)
     inc_days = 0
     dec_days = 0
@@ -63,3 +63,19 @@ def check_low_increase(code_name, data, end_date=None, ma_short=30, ma_long=250,
         return True
 
     return False
+
+
+def check_low_increase_panel(panel, end_date=None, ma_short=30, ma_long=250, threshold=10):
+    columns = panel.tail_columns(threshold, end_date)
+    close = panel.tail('收盘', threshold, columns=columns)
+    p_change = panel.tail('p_change', threshold, columns=columns)
+
+    atr = np.nansum(np.abs(p_change), axis=1) / threshold
+    lowest = close.min(axis=1)
+    ratio = (close.max(axis=1) - lowest) / lowest
+    return (panel.counts >= ma_long) & (panel.bar_counts(end_date) >= threshold) & ~(atr > 10) & (ratio > 1.1)
+
+
+check_low_increase.vectorized = check_low_increase_panel
+# 默认参数下需要的K线数：ma_long日均线 + 最近threshold根K线
+check_low_increase.lookback = 250 + 10
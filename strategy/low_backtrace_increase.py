@@ -1,12 +1,11 @@
 # -*- encoding: UTF-8 -*-
 import logging
+import utils
 
 
 # 低回撤稳步上涨策略
 def check(code_name, data, end_date=None, threshold=60):
-    if end_date is not None:
-        mask = (data['日期'] <= end_date)
-        data = data.loc[mask]
+    data = utils.as_of(data, end_date)
     data = data.tail(n=threshold)
 
     if len(data) < threshold:
@@ -32,3 +31,22 @@ def check(code_name, data, end_date=None, threshold=60):
             #     return False
 
     return True
+
+
+def check_panel(panel, end_date=None, threshold=60):
+    columns = panel.tail_columns(threshold, end_date)
+    close = panel.tail('收盘', threshold, columns=columns)
+    open_ = panel.tail('开盘', threshold, columns=columns)
+    p_change = panel.tail('p_change', threshold, columns=columns)
+
+    ratio_increase = (close[:, -1] - close[:, 0]) / close[:, 0]
+    fall = (p_change[:, :-1] < -7) \
+        | ((close[:, 1:] - open_[:, 1:]) / open_[:, 1:] * 100 < -7) \
+        | (p_change[:, :-1] + p_change[:, 1:] < -10) \
+        | ((close[:, 1:] - open_[:, :-1]) / open_[:, :-1] * 100 < -10)
+    return (panel.bar_counts(end_date) >= threshold) & ~(ratio_increase < 0.6) & ~fall.any(axis=1)
+
+
+check.vectorized = check_panel
+# 默认参数下需要的K线数：最近threshold根K线
+check.lookback = 60
@@ -1,63 +1,70 @@
 # -*- encoding: UTF-8 -*-
 
 import logging
-from strategy import turtle_trade
+import utils
+from market_panel import rolling_max
 
 
 # “停机坪”策略
+# 涨停日（收盘价为之前threshold根K线内的最高价）之后连续3天在涨停价之上窄幅整理
+# 滚动最高价和整理条件对整个区间一次算出，耗时与K线数成线性关系
 def check(code_name, data, end_date=None, threshold=15):
-    origin_data = data
-
-    if end_date is not None:
-        mask = (data['日期'] <= end_date)
-        data = data.loc[mask]
+    data = utils.as_of(data, end_date)
 
     if len(data) < threshold:
         logging.debug("{0}:样本小于{1}天...\n".format(code_name, threshold))
         return
 
+    # 涨停日之前（含）threshold根K线的最高价（turtle_trade.check_enter），需要多取threshold - 1根K线
+    close = data['收盘'].values[-(threshold * 2 - 1):]
+    highest = rolling_max(close, threshold)[-threshold:]
     data = data.tail(n=threshold)
-
-    flag = False
-
-    # 找出涨停日
-    for index, row in data.iterrows():
-        try:
-            if float(row['p_change']) > 9.5:
-                if turtle_trade.check_enter(code_name, origin_data, row['日期'], threshold):
-                    if check_internal(code_name, data, row):
-                        flag = True
-        except KeyError as error:
-            logging.debug("{}处理异常：{}".format(code_name, error))
-
-    return flag
-
-
-def check_internal(code_name, data, limitup_row):
-    limitup_price = limitup_row['收盘']
-    limitup_end = data.loc[(data['日期'] > limitup_row['日期'])]
-    limitup_end = limitup_end.head(n=3)
-    if len(limitup_end.index) < 3:
-        return False
-
-    consolidation_day1 = limitup_end.iloc[0]
-    consolidation_day23 = limitup_end = limitup_end.tail(n=2)
-
-    if not(consolidation_day1['收盘'] > limitup_price and consolidation_day1['开盘'] > limitup_price and
-        0.97 < consolidation_day1['收盘'] / consolidation_day1['开盘'] < 1.03):
-        return False
-
-    threshold_price = limitup_end.iloc[-1]['收盘']
-
-    for index, row in consolidation_day23.iterrows():
-        try:
-            if not (0.97 < (row['收盘'] / row['开盘']) < 1.03 and -5 < row['p_change'] < 5
-                    and row['收盘'] > limitup_price and row['开盘'] > limitup_price):
-                return False
-        except KeyError as error:
-            logging.debug("{}处理异常：{}".format(code_name, error))
-
-    logging.debug("股票{0} 涨停日期：{1}".format(code_name, limitup_row['日期']))
-
-    return True
-
+    close = close[-threshold:]
+    open_ = data['开盘'].values
+    p_change = data['p_change'].values
+
+    hit = limitup_days(close, open_, p_change, highest, threshold)
+    for date in data['日期'].values[:len(hit)][hit]:
+        logging.debug("股票{0} 涨停日期：{1}".format(code_name, date))
+
+    return bool(hit.any())
+
+
+# 最后threshold根K线中前threshold - 3根逐根判断是否为满足条件的涨停日，沿最后一维计算，一维和二维数组通用
+# highest为截至每根K线（含）threshold根K线内的最高收盘价
+def limitup_days(close, open_, p_change, highest, threshold):
+    days = max(threshold - 3, 0)
+    limitup_price = close[..., :days]
+    hit = (p_change[..., :days] > 9.5) & (limitup_price >= highest[..., :days])
+
+    # 涨停次日：高开高走，收盘、开盘都在涨停价之上
+    day1_close, day1_open = close[..., 1:days + 1], open_[..., 1:days + 1]
+    hit &= (day1_close > limitup_price) & (day1_open > limitup_price) & \
+        (0.97 < day1_close / day1_open) & (day1_close / day1_open < 1.03)
+    # 之后两天窄幅整理
+    for offset in (2, 3):
+        day_close, day_open = close[..., offset:days + offset], open_[..., offset:days + offset]
+        day_p_change = p_change[..., offset:days + offset]
+        hit &= (0.97 < day_close / day_open) & (day_close / day_open < 1.03) & \
+            (-5 < day_p_change) & (day_p_change < 5) & (day_close > limitup_price) & (day_open > limitup_price)
+    return hit
+
+
+# 向量化版本：tail中第k根K线为涨停日，k+1至k+3为整理日
+def check_panel(panel, end_date=None, threshold=15):
+    columns = panel.tail_columns(threshold * 2 - 1, end_date)
+    close = panel.tail('收盘', threshold * 2 - 1, columns=columns)
+    # 涨停日收盘价为之前threshold根K线内的最高价（turtle_trade.check_enter）
+    highest = rolling_max(close, threshold)[:, threshold - 1:]
+    columns = columns[:, threshold - 1:]
+    close = close[:, threshold - 1:]
+    open_ = panel.tail('开盘', threshold, columns=columns)
+    p_change = panel.tail('p_change', threshold, columns=columns)
+
+    hit = limitup_days(close, open_, p_change, highest, threshold)
+    return (panel.bar_counts(end_date) >= threshold) & hit.any(axis=1)
+
+
+check.vectorized = check_panel
+# 默认参数下需要的K线数：涨停日之前threshold根K线的最高价 + 最近threshold根K线
+check.lookback = 15 * 2
@@ -1,4 +1,4 @@
-import akshare as ak
+import gateway
 import pandas as pd
 import datetime
 
@@ -7,7 +7,7 @@ def save_stock_data(stock_code):
     current_date = datetime.datetime.now().strftime('%Y-%m-%d')
 
     # 获取股票近20天的行情数据
-    stock_data = ak.stock_zh_a_hist(symbol=stock_code, period="daily", adjust="qfq", start_date=(datetime.datetime.now() - datetime.timedelta(days=30)).strftime('%Y%m%d'), end_date=current_date.replace('-', ''))
+    stock_data = gateway.call('stock_zh_a_hist', symbol=stock_code, period="daily", adjust="qfq", start_date=(datetime.datetime.now() - datetime.timedelta(days=30)).strftime('%Y%m%d'), end_date=current_date.replace('-', ''))
 
     # 检查是否成功获取数据
     if stock_data.empty:
@@ -1,5 +1,8 @@
 # -*- coding: UTF-8 -*-
 
+import utils
+from market_panel import cached, rolling_max
+
 # 总市值
 from strategy import save_stock_data
 
@@ -10,9 +13,7 @@ BALANCE = 200000
 # 最后一个交易日收市价为指定区间内最高价
 def check_enter(code_name, data, end_date=None, threshold=60):
     max_price = 0
-    if end_date is not None:
-        mask = (data['日期'] <= end_date)
-        data = data.loc[mask]
+    data = utils.as_of(data, end_date)
     if data is None:
         return False
     data = data.tail(n=threshold)
@@ -28,3 +29,31 @@ def check_enter(code_name, data, end_date=None, threshold=60):
         return True
 
     return False
+
+
+def check_enter_panel(panel, end_date=None, threshold=60):
+    close = panel.tail('收盘', threshold, end_date)
+    return (panel.bar_counts(end_date) >= threshold) & (close[:, -1] >= close.max(axis=1))
+
+
+# 每个交易日的信号（股票数 × 交易日数），全部历史只计算一次，收盘价矩阵和区间最高价保存在cache中
+def check_enter_signals(panel, dates, cache=None, threshold=60):
+    cache = {} if cache is None else cache
+    n = max(int(panel.counts.max(initial=0)), 1)
+    close = cached(cache, ('收盘', n), lambda: panel.tail('收盘', n))
+    highest = cached(cache, ('max', '收盘', n, threshold), lambda: rolling_max(close, threshold))
+    return panel.on_dates(close >= highest, dates)
+
+
+check_enter.vectorized = check_enter_panel
+# 默认参数下需要的K线数：最近threshold根K线
+check_enter.lookback = 60
+check_enter.signal_matrix = check_enter_signals
+
+
+# 快照预筛：收盘价为区间最高价，则不低于前一日收盘价
+def check_enter_snapshot(snapshot):
+    return snapshot['涨跌幅'] >= 0
+
+
+check_enter.snapshot_filter = check_enter_snapshot
@@ -0,0 +1,114 @@
+# -*- encoding: UTF-8 -*-
+
+import os
+import argparse
+import itertools
+
+import pandas as pd
+
+import data_fetcher
+import history_store
+import parallel_eval
+import settings
+import walk_forward
+from strategy import chandelier_exit
+from strategy import keep_increasing
+from strategy import turtle_trade
+
+# 参数网格：策略名称 -> (策略函数, {参数: 候选值})。
+# 参数的顺序决定任务的划分：除最后一个参数外都相同的组合在同一个任务中计算，共享TR、ATR等中间结果
+GRIDS = {
+    'chandelier_exit': (chandelier_exit.check_enter, {
+        'length': [10, 14, 22],
+        'mult': [1.5, 2.0, 2.5, 3.0],
+        'use_close': [True, False],
+    }),
+    'turtle_trade': (turtle_trade.check_enter, {
+        'threshold': [20, 40, 60, 120],
+    }),
+    'keep_increasing': (keep_increasing.check, {
+        'threshold': [20, 30, 60],
+    }),
+}
+
+
+# 参数网格展开为参数组合列表
+def combinations(grid):
+    return [dict(zip(grid, values)) for values in itertools.product(*grid.values())]
+
+
+# 按除最后一个参数外的参数分组，每组是一个任务
+def groups(combos):
+    grouped = {}
+    for params in combos:
+        grouped.setdefault(tuple(list(params.items())[:-1]), []).append(params)
+    return list(grouped.values())
+
+
+# 依次回测各参数组合：每个交易日收盘按信号买入，持有horizon根K线后卖出。
+# cache在组合之间共享，中间结果只计算一次
+def evaluate(panel, strategy_func, combos, dates, horizon, cache=None):
+    cache = {} if cache is None else cache
+    returns = walk_forward.forward_returns(panel, dates, horizon)
+    rows = []
+    for params in combos:
+        picked = returns[walk_forward.signals(panel, strategy_func, dates, cache=cache, **params)]
+        picked = picked[~pd.isna(picked)]
+        rows.append({
+            **params,
+            '选股次数': len(picked),
+            '平均收益率': picked.mean() if len(picked) else float('nan'),
+            '胜率': (picked > 0).mean() if len(picked) else float('nan'),
+        })
+    return rows
+
+
+# 子进程中执行一组参数组合，中间结果缓存在本进程中，供之后的任务复用
+def evaluate_task(strategy_func, combos, dates, horizon):
+    cache = parallel_eval.worker.setdefault('cache', {})
+    return evaluate(parallel_eval.worker_panel(), strategy_func, combos, dates, horizon, cache)
+
+
+# 参数扫描：返回按平均收益率从高到低排列的结果表。workers为0时在本进程中计算
+def run(panel, strategy_func, grid, start_date=None, end_date=None, horizon=5, workers=0):
+    dates = walk_forward.trading_dates(panel, start_date, end_date)
+    combos = combinations(grid)
+    if workers:
+        with parallel_eval.pool(panel, workers) as executor:
+            futures = [executor.submit(evaluate_task, strategy_func, group, dates, horizon)
+                       for group in groups(combos)]
+            rows = [row for future in futures for row in future.result()]
+    else:
+        rows = evaluate(panel, strategy_func, combos, dates, horizon)
+    table = pd.DataFrame(rows, columns=list(grid) + ['选股次数', '平均收益率', '胜率'])
+    return table.sort_values('平均收益率', ascending=False, kind='stable', ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='在本地历史数据上扫描策略参数')
+    parser.add_argument('strategy', choices=list(GRIDS), help='策略名称')
+    parser.add_argument('start_date', help='开始日期，例如：2024-01-02')
+    parser.add_argument('end_date', nargs='?', help='结束日期，默认为最后一个交易日')
+    parser.add_argument('--horizon', type=int, default=5, help='持有的K线数')
+    parser.add_argument('--workers', type=int, default=0, help='进程数，默认在本进程中计算')
+    parser.add_argument('--output', default='output', help='结果的保存目录')
+    args = parser.parse_args()
+
+    settings.init()
+    try:
+        panel = data_fetcher.load([(code, code) for code in history_store.codes()])
+    except data_fetcher.HistoryDisabled as error:
+        parser.error(str(error))
+    strategy_func, grid = GRIDS[args.strategy]
+    table = run(panel, strategy_func, grid, args.start_date, args.end_date, args.horizon, args.workers)
+    print(table.to_string())
+
+    os.makedirs(args.output, exist_ok=True)
+    file_path = os.path.join(args.output, 'sweep_{}_{}_{}.csv'.format(
+        args.strategy, args.start_date, args.end_date or 'latest'))
+    table.to_csv(file_path, index=False, encoding='utf-8-sig')
+    print("扫描结果已保存到文件：{}".format(file_path))
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,7 @@ import matplotlib.dates as mdates
 import mplfinance as mpf
 from matplotlib.ticker import FuncFormatter
 
+import backtest
 from strategy.chandelier_exit import chandelier_exit
 
 import datetime
@@ -39,8 +40,8 @@ def get_stock_data(stock_code, start_date, end_date):
     return df
 
 def backtest_chandelier_exit(data):
-    commission_rate = 0.001  # 假设佣金率为 0.1%
-    initial_capital = 20000  # 初始资金
+    commission_rate = backtest.COMMISSION_RATE  # 假设佣金率为 0.1%
+    initial_capital = backtest.INITIAL_CAPITAL  # 初始资金
 
     print("数据框的列名:", data.columns)
     print("开始回测 Chandelier Exit 策略")
@@ -66,70 +67,17 @@ def backtest_chandelier_exit(data):
     # 计算20日均线
     data['MA20'] = data['Close'].rolling(window=20).mean()
     
-    # 初始化回测结果
-    data['Position'] = 0
-    data['Cash'] = initial_capital
-    data['Holdings'] = 0
-    data['Portfolio'] = initial_capital
-    
-    position = 0
-    buy_price = 0
-    buy_date = None
-    trades = []
-    current_capital = initial_capital  # 当前可用资金
-
-    for i in range(1, len(data)):
-        if data.iloc[i]['Buy_Signal'] and position == 0:
-            # 买入信号
-            buy_price = data.iloc[i]['Close']
-            buy_date = data.index[i]
-            shares_to_buy = current_capital // (buy_price * (1 + commission_rate))  # 使用当前资金计算
-            position = shares_to_buy
-            cost = shares_to_buy * buy_price * (1 + commission_rate)
-            current_capital -= cost  # 更新当前资金
-            data.loc[data.index[i], 'Cash'] = current_capital
-            data.loc[data.index[i], 'Holdings'] = shares_to_buy * data.iloc[i]['Close']
-        elif data.iloc[i]['Direction'] == -1 and position > 0:
-            # 卖出信号
-            sell_price = data.iloc[i]['Close']
-            sell_date = data.index[i]
-            revenue = position * sell_price * (1 - commission_rate)
-            current_capital += revenue  # 更新当前资金
-            profit = revenue - (position * buy_price * (1 + commission_rate))
-            returns = (sell_price / buy_price) - 1
-            
-            trades.append({
-                '买入日期': buy_date,
-                '买入价格': buy_price,
-                '卖出日期': sell_date,
-                '卖出价格': sell_price,
-                '收益率': returns,
-                '盈利金额': profit
-            })
-            
-            data.loc[data.index[i], 'Cash'] = current_capital
-            data.loc[data.index[i], 'Holdings'] = 0
-            position = 0
-            buy_price = 0
-            buy_date = None
-        else:
-            # 持仓不变
-            data.loc[data.index[i], 'Cash'] = current_capital
-            data.loc[data.index[i], 'Holdings'] = position * data.iloc[i]['Close']
-        
-        data.loc[data.index[i], 'Position'] = position
-        data.loc[data.index[i], 'Portfolio'] = data.iloc[i]['Cash'] + data.iloc[i]['Holdings']
-    
-    # 计算收益率和回撤
-    data['Returns'] = data['Portfolio'].pct_change()
-    data.loc[data.index[0], 'Returns'] = 0  # 设置第一天的收益率为0
-    data['Cumulative_Returns'] = (1 + data['Returns']).cumprod() - 1
-    data['Drawdown'] = (data['Portfolio'] / data['Portfolio'].cummax()) - 1
+    # 由买卖信号回测：收盘价成交，方向转为-1时卖出
+    result, trades = backtest.run(data['Close'].values, data['Buy_Signal'].values, (data['Direction'] == -1).values,
+                                  index=data.index, initial_capital=initial_capital, commission_rate=commission_rate)
+    for column in result.columns:
+        data[column] = result[column]
     
     # 计算策略指标
-    total_return = data['Cumulative_Returns'].iloc[-1]
-    max_drawdown = data['Drawdown'].min()
-    sharpe_ratio = np.sqrt(252) * data['Returns'].mean() / data['Returns'].std()
+    stats = backtest.statistics(data)
+    total_return = stats['total_return']
+    max_drawdown = stats['max_drawdown']
+    sharpe_ratio = stats['sharpe_ratio']
     
     print(f"总收益率: {total_return:.2%}")
     print(f"最大回撤: {max_drawdown:.2%}")
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import talib as tl
+
+from market_panel import MarketPanel
+
+
+# 生成随机游走的日线数据，列与data_fetcher.fetch的返回一致，用于离线测试
+def make_frame(code, days=300, seed=0, start='2023-01-02', limit_up_rate=0.03, limit_down_rate=0.01):
+    rng = np.random.default_rng(seed)
+    change = rng.normal(rng.uniform(-0.002, 0.005), rng.uniform(0.01, 0.04), days)
+    change[rng.random(days) < limit_up_rate] = 0.1
+    change[rng.random(days) < limit_down_rate] = -0.1
+    # 偶尔出现连续涨停
+    if rng.random() < 0.3:
+        begin = rng.integers(0, max(days - 10, 1))
+        change[begin:begin + rng.integers(3, 10)] = 0.1
+    change = np.clip(change, -0.1, 0.1)
+    close = np.round(10 * np.cumprod(1 + change), 2)
+    prev_close = np.concatenate([[close[0]], close[:-1]])
+    open_ = np.round(prev_close * (1 + rng.normal(0, 0.01, days)), 2)
+    high = np.round(np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.01, days))), 2)
+    low = np.round(np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.01, days))), 2)
+    volume = np.round(rng.lognormal(12, 0.6, days) * (1 + 3 * (np.abs(change) > 0.05)))
+    data = pd.DataFrame({
+        '日期': pd.bdate_range(start, periods=days).strftime('%Y-%m-%d'),
+        '股票代码': code,
+        '开盘': open_,
+        '收盘': close,
+        '最高': high,
+        '最低': low,
+        '成交量': volume,
+        '成交额': np.round(volume * close * 100, 2),
+        '振幅': np.round((high - low) / prev_close * 100, 2),
+        '涨跌幅': np.round((close / prev_close - 1) * 100, 2),
+        '涨跌额': np.round(close - prev_close, 2),
+        '换手率': np.round(rng.uniform(1, 12, days), 2),
+    })
+    data['p_change'] = tl.ROC(data['收盘'], 1)
+    return data
+
+
+def make_market(count=50, days=300, seed=0):
+    stocks_data = {}
+    for i in range(count):
+        code = "{:06d}".format(i)
+        # 部分股票上市较晚
+        offset = (i % 7) * 20 if i % 13 else days - 40
+        frame = make_frame(code, days=days - offset, seed=seed + i,
+                           start=str(pd.bdate_range('2023-01-02', periods=offset + 1)[-1].date()))
+        stocks_data[(code, "股票{}".format(i))] = frame
+    return stocks_data
+
+
+# 按make_market生成行情，其中第suspended_index只股票在suspended区间停牌，返回(stocks_data, float64面板)，用于逐日回测和参数扫描
+def make_panel(count=40, days=300, suspended_index=2, suspended=range(200, 205)):
+    stocks_data = make_market(count=count, days=days)
+    symbol = list(stocks_data)[suspended_index]
+    stocks_data[symbol] = stocks_data[symbol].drop(index=suspended).reset_index(drop=True)
+    return stocks_data, MarketPanel.from_frames(stocks_data, dtype=np.float64)
@@ -0,0 +1,98 @@
+import sys
+import os
+import contextlib
+import io
+import numpy as np
+import pandas as pd
+import pytest
+
+# 将项目根目录添加到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import backtest
+from market_data import make_frame
+from strategy.chandelier_exit import chandelier_exit
+
+
+# 原来backtest_chandelier_exit中逐行回测的实现
+def legacy_backtest(data, commission_rate=0.001, initial_capital=20000):
+    data = data.copy()
+    data['Position'] = 0
+    data['Cash'] = initial_capital
+    data['Holdings'] = 0
+    data['Portfolio'] = initial_capital
+    position = 0
+    buy_price = 0
+    buy_date = None
+    trades = []
+    current_capital = initial_capital
+    for i in range(1, len(data)):
+        if data.iloc[i]['Buy_Signal'] and position == 0:
+            buy_price = data.iloc[i]['Close']
+            buy_date = data.index[i]
+            shares_to_buy = current_capital // (buy_price * (1 + commission_rate))
+            position = shares_to_buy
+            current_capital -= shares_to_buy * buy_price * (1 + commission_rate)
+            data.loc[data.index[i], 'Cash'] = current_capital
+            data.loc[data.index[i], 'Holdings'] = shares_to_buy * data.iloc[i]['Close']
+        elif data.iloc[i]['Direction'] == -1 and position > 0:
+            sell_price = data.iloc[i]['Close']
+            revenue = position * sell_price * (1 - commission_rate)
+            current_capital += revenue
+            trades.append({'买入日期': buy_date, '买入价格': buy_price, '卖出日期': data.index[i], '卖出价格': sell_price,
+                           '收益率': (sell_price / buy_price) - 1,
+                           '盈利金额': revenue - (position * buy_price * (1 + commission_rate))})
+            data.loc[data.index[i], 'Cash'] = current_capital
+            data.loc[data.index[i], 'Holdings'] = 0
+            position = 0
+            buy_price = 0
+            buy_date = None
+        else:
+            data.loc[data.index[i], 'Cash'] = current_capital
+            data.loc[data.index[i], 'Holdings'] = position * data.iloc[i]['Close']
+        data.loc[data.index[i], 'Position'] = position
+        data.loc[data.index[i], 'Portfolio'] = data.iloc[i]['Cash'] + data.iloc[i]['Holdings']
+    data['Returns'] = data['Portfolio'].pct_change()
+    data.loc[data.index[0], 'Returns'] = 0
+    data['Cumulative_Returns'] = (1 + data['Returns']).cumprod() - 1
+    data['Drawdown'] = (data['Portfolio'] / data['Portfolio'].cummax()) - 1
+    return data, trades
+
+
+def make_signals(seed):
+    data = make_frame('000001', days=400, seed=seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        data = chandelier_exit(data)
+    data = data.rename(columns={'收盘': 'Close'}).set_index(pd.to_datetime(data['日期']))
+    return data[['Close', 'Buy_Signal', 'Direction']]
+
+
+@pytest.mark.parametrize('seed', range(8))
+def test_matches_legacy_loop(seed):
+    data = make_signals(seed)
+    expected, expected_trades = legacy_backtest(data)
+    result, trades = backtest.run(data['Close'].values, data['Buy_Signal'].values,
+                                  (data['Direction'] == -1).values, index=data.index)
+
+    assert trades == expected_trades
+    for column in result.columns:
+        assert np.array_equal(result[column].values, expected[column].values.astype(np.float64), equal_nan=True), column
+    stats = backtest.statistics(result)
+    assert stats['total_return'] == expected['Cumulative_Returns'].iloc[-1]
+    assert stats['max_drawdown'] == expected['Drawdown'].min()
+
+
+def test_random_signals_and_small_capital():
+    rng = np.random.default_rng(1)
+    data = make_signals(3)
+    data['Buy_Signal'] = rng.random(len(data)) < 0.2
+    data['Direction'] = np.where(rng.random(len(data)) < 0.2, -1, 1)
+    # 资金不足一股时不建仓
+    for capital in (20000, 5):
+        expected, expected_trades = legacy_backtest(data, initial_capital=capital)
+        result, trades = backtest.run(data['Close'].values, data['Buy_Signal'].values,
+                                      (data['Direction'] == -1).values, index=data.index, initial_capital=capital)
+        assert trades == expected_trades
+        assert np.array_equal(result['Portfolio'].values, expected['Portfolio'].values.astype(np.float64))
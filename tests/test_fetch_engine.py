@@ -0,0 +1,96 @@
+import sys
+import os
+import json
+import threading
+import time
+import urllib.request
+import urllib.error
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 将项目根目录添加到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import fetch_engine
+
+
+# 本地模拟行情服务：每只股票的前两次请求返回429（限流），"999999"始终返回500
+class FakeAkshareHandler(BaseHTTPRequestHandler):
+    hits = {}
+    lock = threading.Lock()
+
+    def do_GET(self):
+        symbol = self.path.rsplit('/', 1)[-1]
+        with self.lock:
+            self.hits[symbol] = self.hits.get(symbol, 0) + 1
+            count = self.hits[symbol]
+        if symbol == '999999':
+            self.send_response(500)
+            self.end_headers()
+            return
+        if count <= 2:
+            self.send_response(429)
+            self.end_headers()
+            return
+        body = json.dumps({'symbol': symbol, '收盘': [10.0, 10.5]}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server():
+    FakeAkshareHandler.hits = {}
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeAkshareHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def make_fetch(server):
+    def fetch(code_name):
+        url = "http://127.0.0.1:{}/hist/{}".format(server.server_address[1], code_name[0])
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return json.loads(response.read())
+    return fetch
+
+
+def test_retry_until_success():
+    server = start_server()
+    stocks = [("{:06d}".format(i), "股票{}".format(i)) for i in range(20)] + [('999999', '坏数据')]
+    options = {'rate': 1000, 'burst': 1000, 'retries': 3, 'backoff_base': 0.01, 'backoff_max': 0.05}
+    try:
+        stocks_data, failed = fetch_engine.run(stocks, make_fetch(server), options)
+    finally:
+        server.shutdown()
+
+    assert len(stocks_data) == 20
+    assert stocks_data[('000003', '股票3')]['symbol'] == '000003'
+    assert list(failed) == [('999999', '坏数据')]
+    assert isinstance(failed[('999999', '坏数据')], urllib.error.HTTPError)
+    # 每只股票的重试预算为3次，共4次请求
+    assert FakeAkshareHandler.hits['999999'] == 4
+
+
+def test_token_bucket_rate_limit():
+    calls = []
+
+    def fetch(code_name):
+        calls.append(time.monotonic())
+        return code_name[0]
+
+    stocks = [(str(i), '') for i in range(30)]
+    start = time.monotonic()
+    stocks_data, failed = fetch_engine.run(stocks, fetch, {'rate': 50, 'burst': 10})
+    elapsed = time.monotonic() - start
+
+    assert len(stocks_data) == 30 and not failed
+    # 突发10个之后按每秒50个匀速放行：剩余20个至少需要0.4秒
+    assert elapsed >= 0.35
+
+
+def test_backoff_is_bounded():
+    for attempt in range(10):
+        assert 0 <= fetch_engine.backoff(attempt, 0.5, 3) <= 3
@@ -0,0 +1,97 @@
+import sys
+import os
+import pandas as pd
+import pytest
+
+# 将项目根目录添加到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import settings
+import gateway
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+
+    def stock_zh_a_hist(symbol, period, start_date, adjust):
+        calls.append((symbol, start_date))
+        return pd.DataFrame({'日期': ['2024-01-02'], '收盘': [10.0 + len(calls)]})
+    monkeypatch.setattr(gateway.ak, 'stock_zh_a_hist', stock_zh_a_hist)
+    return calls
+
+
+def configure(monkeypatch, tmp_path, **options):
+    monkeypatch.setattr(settings, 'config', {'akshare': {'dir': str(tmp_path), **options}}, raising=False)
+
+
+def hist(symbol='000001', start_date='20240101', **kwargs):
+    return gateway.call('stock_zh_a_hist', symbol=symbol, period='daily', start_date=start_date, adjust='qfq', **kwargs)
+
+
+def test_disabled_passes_through(monkeypatch, tmp_path, calls):
+    configure(monkeypatch, tmp_path)
+    hist()
+    hist()
+    assert len(calls) == 2
+    assert not os.listdir(tmp_path)
+
+
+def test_cache_by_arguments(monkeypatch, tmp_path, calls):
+    configure(monkeypatch, tmp_path, enable=True)
+    first = hist()
+    assert hist().equals(first)
+    assert calls == [('000001', '20240101')]
+
+    hist(start_date='20240102')
+    hist(symbol='000002')
+    assert len(calls) == 3
+    # refresh忽略缓存，并更新缓存
+    refreshed = hist(refresh=True)
+    assert len(calls) == 4
+    assert hist().equals(refreshed)
+
+
+def test_ttl(monkeypatch, tmp_path, calls):
+    configure(monkeypatch, tmp_path, enable=True, ttl={'stock_zh_a_hist': 0})
+    hist()
+    hist()
+    assert len(calls) == 2
+
+
+def test_replay(monkeypatch, tmp_path, calls):
+    configure(monkeypatch, tmp_path, enable=True)
+    recorded = hist()
+
+    configure(monkeypatch, tmp_path, replay=True, ttl={'stock_zh_a_hist': 0})
+    assert hist().equals(recorded)
+    with pytest.raises(gateway.ReplayMiss):
+        hist(symbol='000002')
+    assert len(calls) == 1
+
+
+def test_top_list_loaded_lazily_once_a_day(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, 'config', {'data_dir': str(tmp_path)}, raising=False)
+    if 'top_list' in vars(settings):
+        monkeypatch.delattr(settings, 'top_list')
+    monkeypatch.setattr(settings, 'top_lists', {})
+    calls = []
+
+    def stock_lhb_stock_statistic_em(symbol):
+        calls.append(symbol)
+        return pd.DataFrame({'代码': ['000001', '000002', '600000'], '买方机构次数': [2, 1, 3]})
+    monkeypatch.setattr(gateway.ak, 'stock_lhb_stock_statistic_em', stock_lhb_stock_statistic_em)
+    monkeypatch.setattr(settings, 'load_config', lambda required=True: settings.config)
+
+    # 启动时不请求龙虎榜，第一次用到时才请求
+    settings.init()
+    assert calls == []
+    assert settings.top_list == ['000001', '600000']
+    assert settings.top_list == ['000001', '600000']
+    assert len(calls) == 1
+
+    # 同一天内其他进程读取保存的名单
+    settings.top_lists.clear()
+    assert settings.top_list == ['000001', '600000']
+    assert len(calls) == 1
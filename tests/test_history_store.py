@@ -0,0 +1,216 @@
+import sys
+import os
+import time
+import numpy as np
+import pandas as pd
+import pytest
+
+# 将项目根目录添加到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import settings
+import history_store
+import data_fetcher
+import gateway
+from market_data import make_market
+from market_panel import MarketPanel
+
+
+def make_bars(dates, close_offset=0.0):
+    return pd.DataFrame({
+        '日期': pd.to_datetime(dates).date,
+        '股票代码': '000001',
+        '开盘': [10.0 + i + close_offset for i in range(len(dates))],
+        '收盘': [10.5 + i + close_offset for i in range(len(dates))],
+        '最高': [11.0 + i + close_offset for i in range(len(dates))],
+        '最低': [9.5 + i + close_offset for i in range(len(dates))],
+        '成交量': [1000 + i for i in range(len(dates))],
+    })
+
+
+def fake_market(monkeypatch, full, calls):
+    def stock_zh_a_hist(symbol, period, start_date, adjust):
+        calls.append(start_date)
+        mask = pd.to_datetime(full['日期']) >= pd.to_datetime(start_date)
+        return full.loc[mask].reset_index(drop=True)
+    monkeypatch.setattr(gateway.ak, 'stock_zh_a_hist', stock_zh_a_hist)
+
+
+def test_incremental_append(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'config', {'data_dir': str(tmp_path)}, raising=False)
+    calls = []
+    dates = pd.bdate_range('2024-01-01', periods=10)
+
+    fake_market(monkeypatch, make_bars(dates[:8]), calls)
+    first = data_fetcher.fetch(('000001', '平安银行'))
+    assert len(first) == 8
+    assert calls == [data_fetcher.START_DATE]
+
+    fake_market(monkeypatch, make_bars(dates), calls)
+    second = data_fetcher.fetch(('000001', '平安银行'))
+    assert calls[-1] == dates[7].strftime('%Y%m%d')
+    assert second['日期'].tolist() == [d.strftime('%Y-%m-%d') for d in dates]
+    assert second.index.is_unique
+    assert len(history_store.load('000001')) == 10
+
+
+def test_refetch_when_adjusted(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'config', {'data_dir': str(tmp_path)}, raising=False)
+    calls = []
+    dates = pd.bdate_range('2024-01-01', periods=10)
+
+    fake_market(monkeypatch, make_bars(dates[:8]), calls)
+    data_fetcher.fetch(('000001', '平安银行'))
+
+    # 除权后前复权价格整体变化，需要全量重新下载
+    fake_market(monkeypatch, make_bars(dates, close_offset=-1.0), calls)
+    data = data_fetcher.fetch(('000001', '平安银行'))
+    assert calls[-1] == data_fetcher.START_DATE
+    assert data.iloc[0]['收盘'] == 9.5
+    assert history_store.load('000001')['收盘'].tolist() == data['收盘'].tolist()
+
+
+def save_market(count=5):
+    stocks_data = make_market(count=count, days=120)
+    for (code, name), data in stocks_data.items():
+        history_store.save(code, data.drop(columns=['p_change']))
+    return stocks_data
+
+
+def test_panel_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'config', {'data_dir': str(tmp_path)}, raising=False)
+    stocks_data = save_market()
+    codes = [code for code, _ in stocks_data]
+    assert history_store.open_panel() is None
+
+    # 第一次从HDF5文件读取并生成二进制面板，之后直接映射
+    built = data_fetcher.load([(code, code) for code in codes])
+    assert built.source is None
+    mapped = data_fetcher.load([(code, code) for code in codes])
+    assert mapped.source == history_store.panel_path()
+    assert [symbol[0] for symbol in mapped.symbols] == codes
+    np.testing.assert_array_equal(mapped.dates, built.dates)
+    np.testing.assert_array_equal(mapped.values, built.values)
+    expected = MarketPanel.from_frames(stocks_data)
+    np.testing.assert_array_equal(mapped.tail('收盘', 30), expected.tail('收盘', 30))
+
+    # 只取部分股票
+    subset = history_store.open_panel(codes[3:1:-1])
+    assert [symbol[0] for symbol in subset.symbols] == codes[3:1:-1]
+    np.testing.assert_array_equal(subset.values, built.values[3:1:-1])
+
+
+def test_panel_opened_without_scanning(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'config', {'data_dir': str(tmp_path)}, raising=False)
+    stocks_data = save_market()
+    codes = [code for code, _ in stocks_data]
+    built = data_fetcher.load([(code, code) for code in codes])
+
+    # K线位置从索引读取，打开时不计算valid、positions
+    mapped = history_store.open_panel()
+    assert mapped._valid is None and mapped._positions is None
+    for name in ['first', 'last', 'counts']:
+        np.testing.assert_array_equal(getattr(mapped, name), getattr(built, name))
+    np.testing.assert_array_equal(mapped.tail('收盘', 30), built.tail('收盘', 30))
+
+    # 连续的一段股票返回视图，不复制
+    block = history_store.open_panel(codes[1:4])
+    assert [symbol[0] for symbol in block.symbols] == codes[1:4]
+    assert isinstance(block.values, np.memmap) and not block.values.flags.owndata
+    np.testing.assert_array_equal(block.counts, built.counts[1:4])
+    np.testing.assert_array_equal(block.tail('收盘', 30, '2024-06-28'), built.tail('收盘', 30, '2024-06-28')[1:4])
+
+
+def test_panel_expires_after_append(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'config', {'data_dir': str(tmp_path)}, raising=False)
+    stocks_data = save_market()
+    codes = [code for code, _ in stocks_data]
+    history_store.save_panel(data_fetcher.load([(code, code) for code in codes]))
+    assert history_store.open_panel(codes) is not None
+
+    # 某只股票之后又写入了K线
+    later = time.time() + 10
+    os.utime(history_store.path(codes[0]), (later, later))
+    assert history_store.open_panel(codes) is None
+    assert history_store.open_panel(codes[1:]) is not None
+
+
+def test_fetch_only_needed_history(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'config', {'data_dir': str(tmp_path), 'end_date': '2024-06-28'}, raising=False)
+    assert data_fetcher.start_date() == data_fetcher.START_DATE
+    assert data_fetcher.start_date(60) == '20240229'
+    calls = []
+    fake_market(monkeypatch, make_bars(pd.bdate_range('2023-01-02', '2024-06-28')), calls)
+
+    short = data_fetcher.fetch(('000001', '平安银行'), lookback=60)
+    assert calls == [data_fetcher.start_date(60)]
+    assert len(short) >= 60 and short['日期'].iloc[0] >= '2024-02-29'
+    assert short['日期'].iloc[-1] == '2024-06-28'
+
+    # 启用需要更长历史的策略后重新下载，之后只追加
+    longer = data_fetcher.fetch(('000001', '平安银行'), lookback=250)
+    assert calls[-1] == data_fetcher.start_date(250)
+    assert len(longer) >= 250
+    data_fetcher.fetch(('000001', '平安银行'), lookback=250)
+    assert calls[-1] == '20240628'
+    # 本地保存的历史更长时只保留需要的部分
+    assert data_fetcher.fetch(('000001', '平安银行'), lookback=60)['日期'].tolist() == short['日期'].tolist()
+
+
+def test_fetch_until_end_date(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'config', {'data_dir': str(tmp_path)}, raising=False)
+    full = make_bars(pd.bdate_range('2024-01-01', periods=10))
+    calls = []
+
+    def stock_zh_a_hist(symbol, period, start_date, adjust, end_date='20500101'):
+        calls.append(end_date)
+        dates = pd.to_datetime(full['日期'])
+        return full.loc[(dates >= pd.to_datetime(start_date)) & (dates <= pd.to_datetime(end_date))].reset_index(drop=True)
+    monkeypatch.setattr(gateway.ak, 'stock_zh_a_hist', stock_zh_a_hist)
+
+    # 收盘前预热：只下载和保存到前一日
+    data = data_fetcher.fetch(('000001', '平安银行'), end_date='20240111')
+    assert calls == ['20240111']
+    assert data['日期'].iloc[-1] == '2024-01-11'
+    assert len(history_store.load('000001')) == 9
+
+    # 本地已有更新的K线时只取到end_date
+    assert len(data_fetcher.fetch(('000001', '平安银行'))) == 10
+    assert data_fetcher.fetch(('000001', '平安银行'), end_date='20240110')['日期'].iloc[-1] == '2024-01-10'
+
+
+def test_load_without_local_history(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'config', {'data_dir': ''}, raising=False)
+    with pytest.raises(data_fetcher.HistoryDisabled):
+        data_fetcher.load([('000001', '平安银行')])
+
+    # 启用了本地存储但还没有数据时返回空面板
+    monkeypatch.setattr(settings, 'config', {'data_dir': str(tmp_path)}, raising=False)
+    panel = data_fetcher.load([('000001', '平安银行')])
+    assert len(panel) == 0 and len(panel.dates) == 0
+
+
+def test_panel_rebuilt_after_partial_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'config', {'data_dir': str(tmp_path), 'end_date': '2024-06-28'}, raising=False)
+    stocks_data = save_market(count=3)
+    codes = [code for code, _ in stocks_data]
+    history_store.save_panel(data_fetcher.load([(code, code) for code in codes]))
+    fake_market(monkeypatch, make_bars(pd.bdate_range('2023-01-02', '2024-06-28')), [])
+
+    # 每日运行只取部分股票、lookback根K线，不保存面板；本地历史数据更新后旧面板过期
+    loaded = []
+    load = data_fetcher.load
+    monkeypatch.setattr(data_fetcher, 'load', lambda stocks: loaded.append(stocks) or load(stocks))
+    data_fetcher.run([('000001', '平安银行')], lookback=60)
+    data_fetcher.run([('000001', '平安银行')])
+    assert loaded == []
+    assert history_store.open_panel(codes) is None
+
+    # 之后离线读取时由全部本地股票的完整历史重新生成
+    data_fetcher.load([(code, code) for code in codes])
+    panel = history_store.open_panel(codes)
+    assert panel is not None
+    assert panel.counts[codes.index('000001')] == len(history_store.load('000001'))
+    assert panel.counts[codes.index('000001')] > 60
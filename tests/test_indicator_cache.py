@@ -0,0 +1,44 @@
+import sys
+import os
+import numpy as np
+
+# 将项目根目录添加到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import indicator_cache
+from market_data import make_market
+from strategy import enter, breakthrough_platform
+
+
+def test_computed_once_per_symbol(monkeypatch):
+    indicator_cache.clear()
+    calls = []
+    ma = indicator_cache.INDICATORS['MA']
+
+    def counting_ma(data, field, period):
+        calls.append((field, period))
+        return ma(data, field, period)
+
+    monkeypatch.setitem(indicator_cache.INDICATORS, 'MA', counting_ma)
+    code_name, data = list(make_market(count=2).items())[1]
+
+    # 突破平台对每个突破日都会调用放量上涨，成交量均线只需计算一次
+    breakthrough_platform.check(code_name, data)
+    enter.check_volume(code_name, data)
+    assert sorted(set(calls)) == sorted(calls)
+
+    first = indicator_cache.get(code_name, data, 'MA', '收盘', 60)
+    assert first is indicator_cache.get(code_name, data, 'MA', '收盘', 60)
+    # 新增K线后重新计算
+    assert len(indicator_cache.get(code_name, data.head(200), 'MA', '收盘', 60)) == 200
+    indicator_cache.clear()
+
+
+def test_without_code_name_is_not_cached():
+    indicator_cache.clear()
+    data = list(make_market(count=2).values())[1]
+    values = indicator_cache.get(None, data, 'MA', '收盘', 5)
+    assert np.allclose(values[4:], data['收盘'].rolling(5).mean().values[4:])
+    assert not indicator_cache.cache
@@ -0,0 +1,53 @@
+import sys
+import os
+import numpy as np
+import pytest
+import talib
+
+# 将项目根目录添加到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import indicators
+from market_data import make_market
+from market_panel import MarketPanel
+
+
+@pytest.fixture(scope='module')
+def prices():
+    # 第一只股票只有40根K线，左侧用NaN补齐
+    panel = MarketPanel.from_frames(make_market(count=40, days=300), dtype=np.float32)
+    return tuple(panel.tail(field, 300).astype(np.float64) for field in ('最高', '最低', '收盘'))
+
+
+CASES = {
+    'MA': (lambda h, l, c: indicators.ma(c, 20), lambda h, l, c: talib.MA(c, 20)),
+    'EMA': (lambda h, l, c: indicators.ema(c, 20), lambda h, l, c: talib.EMA(c, 20)),
+    'ROC': (lambda h, l, c: indicators.roc(c, 1), lambda h, l, c: talib.ROC(c, 1)),
+    'ATR': (lambda h, l, c: indicators.atr(h, l, c, 14), lambda h, l, c: talib.ATR(h, l, c, 14)),
+    'RSI': (lambda h, l, c: indicators.rsi(c, 6), lambda h, l, c: talib.RSI(c, 6)),
+    'ADX': (lambda h, l, c: indicators.adx(h, l, c, 14), lambda h, l, c: talib.ADX(h, l, c, 14)),
+    'MACD': (lambda h, l, c: indicators.macd(c), lambda h, l, c: talib.MACD(c)),
+    'BOLL': (lambda h, l, c: indicators.boll(c, 20, 2), lambda h, l, c: talib.BBANDS(c, 20, 2, 2)),
+}
+
+
+@pytest.mark.parametrize('name', CASES)
+def test_matches_talib(prices, name):
+    batched, reference = CASES[name]
+    actual = batched(*prices)
+    for i in range(len(prices[0])):
+        expected = reference(*(x[i] for x in prices))
+        if not isinstance(expected, tuple):
+            expected, row = [expected], [actual[i]]
+        else:
+            row = [x[i] for x in actual]
+        for a, e in zip(row, expected):
+            np.testing.assert_allclose(a, e, rtol=1e-9, atol=1e-9)
+
+
+def test_one_dimensional(prices):
+    close = prices[2][5]
+    np.testing.assert_allclose(indicators.rsi(close), talib.RSI(close), rtol=1e-9, atol=1e-9)
+    np.testing.assert_allclose(indicators.macd(close)[2], talib.MACD(close)[2], rtol=1e-9, atol=1e-9)
@@ -0,0 +1,106 @@
+import sys
+import os
+import datetime
+import numpy as np
+import pandas as pd
+import pytest
+
+# 将项目根目录添加到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import settings
+import work_flow
+import live_scan
+from market_data import make_market
+from market_panel import MarketPanel
+from strategy import enter, keep_increasing, parking_apron, turtle_trade
+
+STRATEGIES = {'放量上涨': enter.check_volume, '均线多头': keep_increasing.check, '停机坪': parking_apron.check,
+              '海龟交易法则': turtle_trade.check_enter}
+
+
+def make_snapshot(stocks_data, scale=1.0):
+    rows = []
+    for (code, name), df in stocks_data.items():
+        last = df.iloc[-1]
+        rows.append({'代码': code, '名称': name, '最新价': round(last['收盘'] * scale, 2), '涨跌幅': last['涨跌幅'],
+                     '涨跌额': last['涨跌额'], '成交量': last['成交量'] * scale, '成交额': last['成交额'],
+                     '振幅': last['振幅'], '最高': last['最高'], '最低': last['最低'], '今开': last['开盘'],
+                     '换手率': last['换手率']})
+    return pd.DataFrame(rows)
+
+
+def expected_hits(stocks_data):
+    panel = MarketPanel.from_frames(stocks_data)
+    hits = work_flow.evaluate(panel, STRATEGIES)
+    expected = {}
+    for strategy, results in hits.items():
+        scores = work_flow.calculate_stts_scores(list(results.values()))
+        expected[strategy] = {symbol for (symbol, df), score in zip(results.items(), scores)
+                              if score > 1.5 and work_flow.is_suitable(df.iloc[-1])}
+    return expected
+
+
+@pytest.fixture
+def market(monkeypatch):
+    monkeypatch.setattr(settings, 'config', {'end_date': None, 'vectorized': False, 'push': {'enable': False}},
+                        raising=False)
+    stocks_data = make_market(count=80, days=300, seed=2)
+    # 最后一个交易日都有K线的股票，历史数据不包括最后一个交易日
+    last_date = max(df['日期'].iloc[-1] for df in stocks_data.values())
+    stocks_data = {symbol: df for symbol, df in stocks_data.items() if df['日期'].iloc[-1] == last_date}
+    history = MarketPanel.from_frames({symbol: df.iloc[:-1] for symbol, df in stocks_data.items()})
+    return stocks_data, history, last_date
+
+
+@pytest.mark.parametrize('vectorized', [False, True])
+def test_replay_matches_close(tmp_path, monkeypatch, market, vectorized):
+    settings.config['vectorized'] = vectorized
+    stocks_data, history, last_date = market
+    now = datetime.datetime.fromisoformat(last_date + ' 10:00:00')
+    live_scan.record(make_snapshot(stocks_data, 0.98), tmp_path, now)
+    live_scan.record(make_snapshot(stocks_data), tmp_path, now + datetime.timedelta(seconds=30))
+
+    replayer = live_scan.Replayer(tmp_path)
+    assert replayer.date == last_date
+    scanner = live_scan.run(replayer, panel=history, interval=0, strategies=STRATEGIES)
+
+    panel = MarketPanel.from_frames(stocks_data)
+    assert list(scanner.panel.dates) == list(panel.dates)
+    # 临时K线的p_change由float32的前收盘价计算
+    assert np.allclose(scanner.panel.values, panel.values, equal_nan=True, rtol=1e-4, atol=1e-4)
+
+    # 收盘后全市场重新计算的结果都已推送
+    for strategy, symbols in expected_hits(stocks_data).items():
+        assert symbols <= scanner.pushed[strategy]
+
+
+def test_only_changed_symbols_are_evaluated(monkeypatch, market):
+    stocks_data, history, last_date = market
+    scanner = live_scan.LiveScan(history, STRATEGIES, last_date)
+    snapshot = make_snapshot(stocks_data)
+    assert len(scanner.merge(snapshot)) == len(stocks_data)
+    assert len(scanner.merge(snapshot)) == 0
+
+    snapshot.loc[3, '最新价'] += 0.01
+    assert scanner.merge(snapshot).tolist() == [3]
+
+    calls = []
+    monkeypatch.setattr(work_flow, 'evaluate', lambda panel, strategies, indices=None: calls.append(indices) or {})
+    scanner.scan(snapshot)
+    assert calls == [[]]
+
+
+def test_history_excludes_today(monkeypatch, market):
+    stocks_data, history, last_date = market
+    calls = []
+    monkeypatch.setattr(live_scan.data_fetcher, 'run', lambda stocks, lookback=None, end_date=None:
+                        calls.append(end_date) or history)
+    snapshots = iter([make_snapshot(stocks_data)])
+
+    def source():
+        return next(snapshots)
+    live_scan.run(source, date=last_date, interval=0, strategies=STRATEGIES)
+    assert calls == [(datetime.date.fromisoformat(last_date) - datetime.timedelta(days=1)).strftime('%Y%m%d')]
@@ -0,0 +1,104 @@
+import sys
+import os
+import numpy as np
+
+import utils
+
+# 将项目根目录添加到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from market_data import make_market
+from market_panel import MarketPanel, FIELDS
+from strategy import enter, keep_increasing, parking_apron, turtle_trade, backtrace_ma250, climax_limitdown
+from strategy import breakthrough_platform, low_backtrace_increase
+
+STRATEGIES = [enter.check_volume, keep_increasing.check, parking_apron.check, turtle_trade.check_enter,
+              backtrace_ma250.check, climax_limitdown.check, breakthrough_platform.check,
+              low_backtrace_increase.check]
+
+
+def test_alignment_and_views():
+    stocks_data = make_market(count=10)
+    panel = MarketPanel.from_frames(stocks_data)
+
+    assert panel.values.dtype == np.float32
+    assert panel['收盘'].shape == (10, len(panel.dates))
+    for symbol, df in stocks_data.items():
+        view = panel.frame(symbol)
+        assert view['日期'].tolist() == df['日期'].tolist()
+        assert np.allclose(view['收盘'].values, df['收盘'].values)
+        assert np.shares_memory(view['收盘'].values, panel.values)
+
+
+def test_suspended_rows_are_skipped():
+    stocks_data = make_market(count=3)
+    symbol = list(stocks_data)[1]
+    stocks_data[symbol] = stocks_data[symbol].drop(index=[100, 101]).reset_index(drop=True)
+    panel = MarketPanel.from_frames(stocks_data)
+
+    view = panel.frame(symbol)
+    assert view['日期'].tolist() == stocks_data[symbol]['日期'].tolist()
+    assert not view[FIELDS].isna().all(axis=1).any()
+
+
+def test_strategies_match_frames():
+    stocks_data = make_market(count=40)
+    panel = MarketPanel.from_frames(stocks_data, dtype=np.float64)
+    for strategy_func in STRATEGIES:
+        expected = [symbol for symbol, df in stocks_data.items() if strategy_func(symbol, df.copy())]
+        actual = [symbol for symbol, df in panel.items() if strategy_func(symbol, df)]
+        assert actual == expected, strategy_func
+
+
+def test_as_of_slices_views():
+    stocks_data = make_market(count=3)
+    symbol = list(stocks_data)[1]
+    panel = MarketPanel.from_frames(stocks_data)
+    for end_date in ['2023-03-01', '2023-03-04', '2024-06-28', '2000-01-01', '2099-01-01']:
+        df = stocks_data[symbol]
+        expected = df.loc[df['日期'] <= end_date]
+        view = utils.as_of(panel.frame(symbol), end_date)
+        assert view['日期'].tolist() == expected['日期'].tolist()
+        assert utils.as_of(df, end_date)['日期'].tolist() == expected['日期'].tolist()
+        if not view.empty:
+            assert np.shares_memory(view['收盘'].values, panel.values)
+
+
+def test_empty_input():
+    # 没有股票或全部获取失败
+    panel = MarketPanel.from_frames({})
+    assert len(panel) == 0 and len(panel.dates) == 0
+    assert dict(panel.items()) == {}
+
+    panel = MarketPanel([('000001', '平安银行')], [], np.empty((1, 0, len(FIELDS)), dtype=np.float32))
+    assert panel.counts.tolist() == [0]
+    assert panel.frame(('000001', '平安银行')).empty
+
+
+def test_tail_columns_with_gaps():
+    stocks_data = make_market(count=4)
+    symbols = list(stocks_data)
+    stocks_data[symbols[1]] = stocks_data[symbols[1]].drop(index=[100, 101, 230]).reset_index(drop=True)
+    stocks_data[symbols[2]] = stocks_data[symbols[2]].iloc[50:].reset_index(drop=True)
+    panel = MarketPanel.from_frames(stocks_data)
+    assert panel.contiguous.tolist() == [True, False, True, True]
+
+    # 按positions逐列取的结果
+    for end_date in [None, '2023-03-01', '2024-06-28', '2000-01-01', '2099-01-01']:
+        if end_date is None:
+            counts = panel.valid.sum(axis=1)
+        else:
+            counts = panel.valid[:, panel.dates <= np.datetime64(end_date)].sum(axis=1)
+        assert panel.bar_counts(end_date).tolist() == counts.tolist()
+        index = counts[:, None] - 30 + np.arange(30)
+        expected = np.take_along_axis(panel.positions, np.clip(index, 0, None), axis=1)
+        expected[index < 0] = -1
+        np.testing.assert_array_equal(panel.tail_columns(30, end_date), expected)
+
+    # 给出(first, last, counts)时不扫描收盘价
+    bars = np.stack([panel.first, panel.last, panel.counts])
+    stored = MarketPanel(panel.symbols, panel.dates, panel.values, bars)
+    np.testing.assert_array_equal(stored.tail('收盘', 30), panel.tail('收盘', 30))
+    assert stored._valid is None and stored._positions is None
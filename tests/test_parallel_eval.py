@@ -0,0 +1,68 @@
+import sys
+import os
+import numpy as np
+import pytest
+
+# 将项目根目录添加到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import settings
+import history_store
+import work_flow
+import parallel_eval
+from market_data import make_market
+from market_panel import MarketPanel
+from strategy import enter, keep_increasing, parking_apron, turtle_trade
+
+
+def test_matches_single_process(monkeypatch):
+    monkeypatch.setattr(settings, 'config', {'end_date': None, 'vectorized': False}, raising=False)
+    panel = MarketPanel.from_frames(make_market(count=80))
+    strategies = {'放量上涨': enter.check_volume, '均线多头': keep_increasing.check,
+                  '停机坪': parking_apron.check, '海龟交易法则': turtle_trade.check_enter}
+
+    hits, scores = parallel_eval.evaluate(panel, strategies, workers=2)
+    expected = work_flow.evaluate(panel, strategies)
+    for strategy in strategies:
+        assert sorted(hits[strategy]) == sorted(expected[strategy])
+        for symbol, df in expected[strategy].items():
+            df = work_flow.calculate_technical_indicators(df, symbol)
+            assert np.isclose(scores[strategy][symbol], work_flow.calculate_advanced_stts_score(df))
+    assert any(hits.values())
+
+
+def test_memory_mapped_panel(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'config', {'end_date': None, 'vectorized': False, 'data_dir': str(tmp_path)},
+                        raising=False)
+    history_store.save_panel(MarketPanel.from_frames(make_market(count=40)))
+    panel = history_store.open_panel()
+    assert panel.source is not None
+    strategies = {'均线多头': keep_increasing.check, '海龟交易法则': turtle_trade.check_enter}
+
+    hits, _ = parallel_eval.evaluate(panel, strategies, workers=2)
+    expected = work_flow.evaluate(panel, strategies)
+    for strategy in strategies:
+        assert sorted(hits[strategy]) == sorted(expected[strategy])
+    assert any(hits.values())
+
+
+def test_shared_memory_released_on_error(monkeypatch):
+    monkeypatch.setattr(settings, 'config', {'end_date': None, 'vectorized': False}, raising=False)
+    panel = MarketPanel.from_frames(make_market(count=5))
+    created = []
+    original = parallel_eval.shared_memory.SharedMemory
+
+    def tracking(*args, **kwargs):
+        shm = original(*args, **kwargs)
+        created.append(shm.name)
+        return shm
+    monkeypatch.setattr(parallel_eval.shared_memory, 'SharedMemory', tracking)
+
+    with pytest.raises(ZeroDivisionError):
+        with parallel_eval.pool(panel, 1):
+            1 / 0
+    monkeypatch.setattr(parallel_eval.shared_memory, 'SharedMemory', original)
+    with pytest.raises(FileNotFoundError):
+        original(name=created[0])
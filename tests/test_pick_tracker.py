@@ -0,0 +1,87 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+# 将项目根目录添加到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import settings
+import data_fetcher
+import history_store
+import pick_tracker
+from market_data import make_frame
+
+CODES = ['000001', '000002', '600000']
+
+
+def setup(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'config', {'data_dir': str(tmp_path / 'data')}, raising=False)
+    frames = {}
+    for seed, code in enumerate(CODES):
+        frames[code] = make_frame(code, days=60, seed=seed).drop(columns=['p_change'])
+        history_store.save(code, frames[code])
+    output = tmp_path / 'output'
+    output.mkdir()
+    return frames, str(output)
+
+
+def write_picks(output, strategy, date, codes):
+    pd.DataFrame({'日期': date, '收盘': 10.0, '股票代码': ["('{}', '名称')".format(code) for code in codes]}).to_csv(
+        os.path.join(output, '{}_latest_data_{}.csv'.format(strategy, date)), index=False)
+
+
+def expected(data, date):
+    close, low = data['收盘'].values, data['最低'].values
+    bar = data.index[data['日期'] == date][0]
+    returns = [close[bar + h] / close[bar] - 1 if bar + h < len(data) else np.nan for h in pick_tracker.HORIZONS]
+    mae = min(low[bar + 1:bar + 21].min() / close[bar] - 1, 0)
+    return returns, mae
+
+
+def test_forward_returns(tmp_path, monkeypatch):
+    frames, output = setup(tmp_path, monkeypatch)
+    dates = frames['000001']['日期']
+    write_picks(output, '海龟交易法则', dates[10], ['000001', '600000'])
+    write_picks(output, '均线多头', dates[50], ['000002', '999999'])
+
+    state = pick_tracker.update(output).set_index(['策略', '代码'])
+    for strategy, code, date in [('海龟交易法则', '000001', dates[10]), ('海龟交易法则', '600000', dates[10]),
+                                 ('均线多头', '000002', dates[50])]:
+        returns, mae = expected(frames[code], date)
+        row = state.loc[(strategy, code)]
+        np.testing.assert_allclose(row[pick_tracker.RETURNS].astype(float), returns, rtol=1e-5, atol=1e-6)
+        assert np.isclose(row[pick_tracker.MAE], mae, atol=1e-6)
+    # 之后不足20根K线的选股还没有完成，没有历史数据的股票没有结果
+    assert state.loc[('海龟交易法则', '000001'), '完成']
+    assert not state.loc[('均线多头', '000002'), '完成']
+    assert np.isnan(state.loc[('均线多头', '999999'), pick_tracker.MAE])
+
+    summary = pick_tracker.summary(pick_tracker.load_state(output))
+    assert summary.loc['海龟交易法则', '选股次数'] == 2
+
+
+def test_incremental_update(tmp_path, monkeypatch):
+    frames, output = setup(tmp_path, monkeypatch)
+    dates = frames['000001']['日期']
+    write_picks(output, '海龟交易法则', dates[10], ['000001'])
+    write_picks(output, '均线多头', dates[50], ['000002'])
+    pick_tracker.update(output)
+
+    loaded = []
+    load = data_fetcher.load
+    monkeypatch.setattr(data_fetcher, 'load', lambda stocks: loaded.append(stocks) or load(stocks))
+    # 只重新计算未完成的选股
+    pick_tracker.update(output)
+    assert loaded == [[('000002', '000002')]]
+
+    # 新增的文件只读取一次，已完成的选股不再计算
+    write_picks(output, '海龟交易法则', dates[12], ['600000'])
+    state = pick_tracker.update(output)
+    assert loaded[-1] == [('000002', '000002'), ('600000', '600000')]
+    assert len(state) == 3
+
+    os.remove(os.path.join(output, '均线多头_latest_data_{}.csv'.format(dates[50])))
+    assert pick_tracker.update(output)['策略'].tolist() == ['海龟交易法则', '海龟交易法则']
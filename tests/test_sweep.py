@@ -0,0 +1,63 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+# 将项目根目录添加到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import sweep
+import walk_forward
+from market_data import make_panel
+from strategy import chandelier_exit, keep_increasing, turtle_trade
+
+
+def test_signal_matrix_matches_daily_kernel():
+    _, panel = make_panel(count=30)
+    dates = walk_forward.trading_dates(panel, '2023-08-01', '2023-10-31')
+    cases = [
+        (chandelier_exit.check_enter, {'length': 10, 'mult': 1.5, 'use_close': False}),
+        (chandelier_exit.check_enter, {'length': 14, 'mult': 2.0, 'use_close': True}),
+        (turtle_trade.check_enter, {'threshold': 20}),
+        (keep_increasing.check, {'threshold': 12}),
+    ]
+    cache = {}
+    for strategy_func, params in cases:
+        matrix = strategy_func.signal_matrix(panel, dates, cache=cache, **params)
+        expected = np.column_stack([strategy_func.vectorized(panel, end_date=date, **params) for date in dates])
+        assert np.array_equal(matrix, expected), (strategy_func.__module__, params)
+
+
+def test_groups_share_all_but_last_parameter():
+    grid = sweep.GRIDS['chandelier_exit'][1]
+    combos = sweep.combinations(grid)
+    assert len(combos) == 3 * 4 * 2
+    groups = sweep.groups(combos)
+    assert len(groups) == 3 * 4
+    assert all(len({(p['length'], p['mult']) for p in group}) == 1 for group in groups)
+
+
+def test_parallel_sweep_matches_serial():
+    _, panel = make_panel(count=30)
+    grid = {'length': [10, 14], 'mult': [2.0, 3.0], 'use_close': [True, False]}
+    serial = sweep.run(panel, chandelier_exit.check_enter, grid, '2023-06-01', horizon=3)
+    parallel = sweep.run(panel, chandelier_exit.check_enter, grid, '2023-06-01', horizon=3, workers=2)
+
+    assert len(serial) == 8
+    assert serial['选股次数'].sum() > 0
+    ranked = serial['平均收益率'].dropna()
+    assert ranked.is_monotonic_decreasing
+    pd.testing.assert_frame_equal(serial, parallel)
+
+
+def test_sweep_rows_match_walk_forward():
+    _, panel = make_panel(count=30)
+    table = sweep.run(panel, turtle_trade.check_enter, {'threshold': [20, 60]}, '2023-06-01', horizon=5)
+    picks = walk_forward.run(panel, {'海龟交易法则': turtle_trade.check_enter}, '2023-06-01', horizons=(5,))
+    row = table.set_index('threshold').loc[60]
+    returns = picks['5日收益率'].dropna()
+    assert row['选股次数'] == len(returns)
+    assert np.isclose(row['平均收益率'], returns.mean())
+    assert np.isclose(row['胜率'], (returns > 0).mean())
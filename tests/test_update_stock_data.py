@@ -0,0 +1,76 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+# 将项目根目录添加到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import settings
+import gateway
+import history_store
+import update_stock_data
+from market_data import make_frame
+
+
+def write_picks(tmp_path):
+    first = pd.DataFrame({
+        '日期': ['2024-09-04', '2024-09-04'],
+        '收盘': [10.0, 20.0],
+        '涨跌幅': [1.0, 2.0],
+        '换手率': [5.0, 6.0],
+        '股票代码': ["('000001', '平安银行')", "('600000', '浦发银行')"],
+    })
+    second = pd.DataFrame({
+        '日期': ['2024-09-05'],
+        '收盘': [30.0],
+        '涨跌幅': [3.0],
+        '最新价': [29.0],
+        '最新涨跌幅': [-1.0],
+        '股票代码': ["('300001', '特锐德')"],
+    })
+    files = [str(tmp_path / '均线多头_latest_data_2024-09-04.csv'), str(tmp_path / '停机坪_latest_data_2024-09-05.csv')]
+    first.to_csv(files[0], index=False)
+    second.to_csv(files[1], index=False)
+    return files
+
+
+def test_refresh_from_one_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'config', {}, raising=False)
+    calls = []
+
+    def stock_zh_a_spot_em():
+        calls.append(1)
+        return pd.DataFrame({'代码': ['600000', '000001', '000002'], '最新价': [21.234, 10.5, 3.0],
+                             '涨跌幅': [6.17, 5.0, 1.0]})
+    monkeypatch.setattr(gateway.ak, 'stock_zh_a_spot_em', stock_zh_a_spot_em)
+    files = write_picks(tmp_path)
+
+    update_stock_data.update_all(files)
+    assert len(calls) == 1
+    first = pd.read_csv(files[0], dtype={'股票代码': str})
+    assert first.columns.tolist() == ['日期', '收盘', '换手率', '股票代码', '最新价', '最新涨跌幅']
+    assert first['最新价'].tolist() == [10.5, 21.23]
+    assert first['最新涨跌幅'].tolist() == [5.0, 6.17]
+    # 快照中没有的股票保留原值
+    second = pd.read_csv(files[1])
+    assert second.columns.tolist() == ['日期', '收盘', '最新价', '最新涨跌幅', '股票代码']
+    assert second[['最新价', '最新涨跌幅']].values.tolist() == [[29.0, -1.0]]
+
+
+def test_refresh_from_history(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'config', {'data_dir': str(tmp_path / 'data')}, raising=False)
+    for code in ('000001', '300001'):
+        history_store.save(code, make_frame(code, days=30, seed=int(code)).drop(columns=['p_change']))
+    files = write_picks(tmp_path)
+
+    update_stock_data.update_all(files, source='history')
+    first = pd.read_csv(files[0])
+    close = history_store.load('000001')['收盘'].values
+    assert first['最新价'].iloc[0] == round(close[-1], 2)
+    assert np.isclose(first['最新涨跌幅'].iloc[0], round((close[-1] - close[-2]) / close[-2] * 100, 2))
+    assert np.isnan(first['最新价'].iloc[1])
+    second = pd.read_csv(files[1])
+    assert second['最新价'].iloc[0] == round(history_store.load('300001')['收盘'].values[-1], 2)
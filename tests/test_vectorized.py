@@ -0,0 +1,86 @@
+import sys
+import os
+import contextlib
+import io
+import numpy as np
+import pytest
+
+# 将项目根目录添加到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import settings
+from market_data import make_market
+from market_panel import MarketPanel
+from strategy import enter, keep_increasing, parking_apron, turtle_trade, backtrace_ma250, climax_limitdown
+from strategy import breakthrough_platform, low_backtrace_increase, high_tight_flag, low_atr, chandelier_exit
+
+STRATEGIES = [enter.check_volume, enter.check_breakthrough, enter.check_ma, enter.check_new,
+              enter.check_continuous_volume, keep_increasing.check, parking_apron.check, turtle_trade.check_enter,
+              backtrace_ma250.check, climax_limitdown.check, breakthrough_platform.check,
+              low_backtrace_increase.check, high_tight_flag.check, low_atr.check_low_increase,
+              chandelier_exit.check_enter]
+
+
+@pytest.fixture(scope='module')
+def panel():
+    stocks_data = make_market(count=300, days=500)
+    settings.top_list = [symbol[0] for symbol in list(stocks_data)[::2]]
+    return MarketPanel.from_frames(stocks_data, dtype=np.float64)
+
+
+def reference(strategy_func, panel, end_date):
+    hits = []
+    for symbol, df in panel.items():
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                hits.append(bool(strategy_func(symbol, df.copy(), end_date=end_date)))
+        except IndexError:
+            # 回测日期之前的K线不足时，部分策略会越界
+            hits.append(False)
+    return np.array(hits)
+
+
+@pytest.mark.parametrize('end_date', [None, '2024-03-01', '2024-11-13'])
+@pytest.mark.parametrize('strategy_func', STRATEGIES, ids=lambda f: f.__module__ + '.' + f.__name__)
+def test_kernel_matches_reference(panel, strategy_func, end_date):
+    expected = reference(strategy_func, panel, end_date)
+    actual = strategy_func.vectorized(panel, end_date=end_date)
+    assert actual.dtype == bool
+    assert actual.tolist() == expected.tolist()
+
+
+# 吊灯止损的逐根K线递推定义
+def trailing_stops_reference(close, long_stop, short_stop):
+    long_stop, short_stop = list(long_stop), list(short_stop)
+    direction = []
+    for t in range(len(close)):
+        long_prev = long_stop[t] if t == 0 or np.isnan(long_stop[t - 1]) else long_stop[t - 1]
+        short_prev = short_stop[t] if t == 0 or np.isnan(short_stop[t - 1]) else short_stop[t - 1]
+        if t > 0 and close[t - 1] > long_prev:
+            long_stop[t] = max(long_stop[t], long_prev)
+        if t > 0 and close[t - 1] < short_prev:
+            short_stop[t] = min(short_stop[t], short_prev)
+        if close[t] > short_prev:
+            direction.append(1)
+        elif close[t] < long_prev:
+            direction.append(-1)
+        else:
+            direction.append(direction[-1] if direction else 1)
+    return np.array(long_stop), np.array(short_stop), np.array(direction)
+
+
+def test_trailing_stops_match_recursive_definition(panel):
+    n = 120
+    close = panel.tail('收盘', n)[:20]
+    atr = chandelier_exit.rolling_mean(chandelier_exit.true_range_panel(
+        panel.tail('最高', n)[:20], panel.tail('最低', n)[:20], close), 14)
+    long_stop = chandelier_exit.rolling_max(close, 14) - 2 * atr
+    short_stop = chandelier_exit.rolling_min(close, 14) + 2 * atr
+    actual = chandelier_exit.trailing_stops(close, long_stop, short_stop)
+    assert (actual[2] == -1).any() and (actual[2] == 1).any()
+    for i in range(len(close)):
+        expected = trailing_stops_reference(close[i], long_stop[i], short_stop[i])
+        for a, e in zip(actual, expected):
+            np.testing.assert_array_equal(a[i], e)
@@ -0,0 +1,55 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+# 将项目根目录添加到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import walk_forward
+from market_data import make_panel
+from strategy import turtle_trade, enter
+
+
+def per_symbol(code_name, data, end_date=None):
+    return turtle_trade.check_enter(code_name, data, end_date=end_date)
+
+
+def test_signals_match_daily_screens():
+    stocks_data, panel = make_panel()
+    dates = walk_forward.trading_dates(panel, '2023-09-01', '2023-10-31')
+    assert dates[0] >= '2023-09-01' and dates[-1] <= '2023-10-31'
+
+    matrix = walk_forward.signals(panel, turtle_trade.check_enter, dates)
+    assert matrix.any()
+    assert np.array_equal(matrix, walk_forward.signals(panel, per_symbol, dates))
+    for j in (0, len(dates) // 2, len(dates) - 1):
+        expected = [bool(turtle_trade.check_enter(symbol, df, end_date=dates[j])) for symbol, df in stocks_data.items()]
+        assert matrix[:, j].tolist() == expected
+
+
+def test_forward_returns():
+    stocks_data, panel = make_panel()
+    dates = walk_forward.trading_dates(panel)
+    returns = walk_forward.forward_returns(panel, dates, 5)
+    for i, df in enumerate(stocks_data.values()):
+        expected = pd.Series(df['收盘'].shift(-5).values / df['收盘'].values - 1, index=df['日期'].values)
+        actual = pd.Series(returns[i], index=dates)
+        assert np.allclose(actual.reindex(expected.index).values, expected.values, equal_nan=True)
+        # 没有K线的交易日为NaN
+        assert actual.drop(expected.index).isna().all()
+
+
+def test_run_and_summary():
+    stocks_data, panel = make_panel()
+    strategies = {'海龟交易法则': turtle_trade.check_enter, '放量上涨': enter.check_volume}
+    picks = walk_forward.run(panel, strategies, '2023-06-01', horizons=(1, 5))
+    assert set(picks['策略']) <= set(strategies)
+    assert list(picks.columns) == ['策略', '日期', '代码', '名称', '1日收益率', '5日收益率']
+
+    table = walk_forward.summary(picks, horizons=(1, 5))
+    turtle = picks[picks['策略'] == '海龟交易法则']
+    assert table.loc['海龟交易法则', '选股次数'] == len(turtle)
+    assert np.isclose(table.loc['海龟交易法则', '5日平均收益率'], turtle['5日收益率'].mean())
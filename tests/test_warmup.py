@@ -0,0 +1,59 @@
+import sys
+import os
+import datetime
+
+# 将项目根目录添加到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import settings
+import data_fetcher
+import gateway
+import work_flow
+import warmup
+from market_panel import MarketPanel
+from test_live_scan import STRATEGIES, make_snapshot, market  # noqa: F401
+
+
+def test_close_only_appends_final_bar(monkeypatch, market):
+    stocks_data, history, last_date = market
+    calls = []
+    monkeypatch.setattr(data_fetcher, 'run', lambda stocks, lookback=None, end_date=None:
+                        calls.append((len(stocks), lookback, end_date)) or history)
+    reported = {}
+    monkeypatch.setattr(work_flow, 'report', lambda strategy, results, scores=None:
+                        reported.setdefault(strategy, set(results)))
+
+    snapshot = make_snapshot(stocks_data)
+    task = warmup.Warmup(STRATEGIES, last_date)
+    task.prepare(snapshot)
+    # 预热时只取到前一日的历史数据
+    previous = (datetime.date.fromisoformat(last_date) - datetime.timedelta(days=1)).strftime('%Y%m%d')
+    assert calls == [(len(stocks_data), work_flow.lookback(STRATEGIES), previous)]
+
+    task.finish(snapshot)
+    assert len(calls) == 1
+    # 与收盘后用完整历史数据、对通过快照预筛的股票执行策略的结果一致
+    candidates = set(work_flow.pushdown(snapshot, STRATEGIES)['代码'])
+    expected = work_flow.evaluate(MarketPanel.from_frames(stocks_data), STRATEGIES)
+    for strategy, results in expected.items():
+        assert reported[strategy] == {symbol for symbol in results if symbol[0] in candidates}
+
+
+def test_falls_back_when_warmup_failed(monkeypatch, market):
+    stocks_data, history, last_date = market
+    monkeypatch.setattr(gateway, 'call', lambda name, refresh=False, **kwargs: make_snapshot(stocks_data))
+    monkeypatch.setattr(data_fetcher, 'run', lambda *args, **kwargs: 1 / 0)
+    calls = []
+    monkeypatch.setattr(work_flow, 'prepare', lambda: calls.append(True))
+
+    task = warmup.Warmup(STRATEGIES, last_date).start()
+    assert task.scanner is None
+    task.finish()
+    assert calls == [True]
+
+
+def test_options(monkeypatch):
+    monkeypatch.setattr(settings, 'config', {'warmup': {'enable': True}}, raising=False)
+    assert warmup.options() == {**warmup.DEFAULTS, 'enable': True}
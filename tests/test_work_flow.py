@@ -0,0 +1,96 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+# 将项目根目录添加到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import settings
+import work_flow
+from market_data import make_market
+from market_panel import MarketPanel
+from strategy import enter, turtle_trade, keep_increasing
+
+
+def make_snapshot():
+    return pd.DataFrame({
+        '代码': ['000001', '000002', '000003', '000004', '000005'],
+        '名称': ['放量', '收阴', '停牌', '高价', '平盘'],
+        '最新价': [10.0, 10.0, None, 50.0, 10.0],
+        '今开': [9.0, 11.0, None, 40.0, 10.0],
+        '涨跌幅': [3.0, 2.5, None, 5.0, 0.0],
+        '成交量': [1e6, 1e6, None, 1e6, 1e3],
+        '换手率': [5.0, 5.0, None, 5.0, 5.0],
+    })
+
+
+def test_pushdown(monkeypatch):
+    monkeypatch.setattr(settings, 'config', {'end_date': None}, raising=False)
+    snapshot = make_snapshot()
+
+    result = work_flow.pushdown(snapshot, {'放量上涨': enter.check_volume})
+    assert result['代码'].tolist() == ['000001', '000003']
+
+    result = work_flow.pushdown(snapshot, {'放量上涨': enter.check_volume, '海龟交易法则': turtle_trade.check_enter})
+    assert result['代码'].tolist() == ['000001', '000002', '000003', '000005']
+
+    # 未声明快照条件的策略只受最新行情过滤条件约束
+    result = work_flow.pushdown(snapshot, {'均线多头': keep_increasing.check})
+    assert result['代码'].tolist() == ['000001', '000002', '000003', '000005']
+
+
+def test_pushdown_disabled_for_backtest(monkeypatch):
+    monkeypatch.setattr(settings, 'config', {'end_date': '2024-01-02'}, raising=False)
+    snapshot = make_snapshot()
+    assert len(work_flow.pushdown(snapshot, {'放量上涨': enter.check_volume})) == len(snapshot)
+
+
+def test_screen_modes_agree(monkeypatch):
+    panel = MarketPanel.from_frames(make_market(count=60), dtype=np.float64)
+    for vectorized in (False, True):
+        monkeypatch.setattr(settings, 'config', {'end_date': None, 'vectorized': vectorized}, raising=False)
+        results = work_flow.screen(panel, turtle_trade.check_enter)
+        assert all(df['日期'].iloc[-1] == panel.frame(symbol)['日期'].iloc[-1] for symbol, df in results.items())
+        if vectorized:
+            assert list(results) == expected
+        else:
+            expected = list(results)
+    assert expected
+
+
+def test_evaluate_single_pass(monkeypatch):
+    monkeypatch.setattr(settings, 'config', {'end_date': None, 'vectorized': False}, raising=False)
+    panel = MarketPanel.from_frames(make_market(count=60), dtype=np.float64)
+    strategies = {'放量上涨': enter.check_volume, '均线多头': keep_increasing.check, '海龟交易法则': turtle_trade.check_enter}
+
+    visits = []
+    items = panel.items
+    monkeypatch.setattr(panel, 'items', lambda: (visits.append(1) or item for item in items()))
+    hits = work_flow.evaluate(panel, strategies)
+    assert len(visits) == len(panel)
+
+    monkeypatch.setattr(panel, 'items', items)
+    for strategy, strategy_func in strategies.items():
+        assert list(hits[strategy]) == list(work_flow.screen(panel, strategy_func))
+
+
+def test_stts_scores_match_indicator_columns():
+    for dtype in (np.float32, np.float64):
+        panel = MarketPanel.from_frames(make_market(count=60, days=400), dtype=dtype)
+        for bars in (None, 30, 14):
+            frames = [panel.frame(i) if bars is None else panel.frame(i).head(bars) for i in range(len(panel))]
+            expected = [work_flow.calculate_advanced_stts_score(work_flow.calculate_technical_indicators(df.copy()))
+                        for df in frames]
+            assert np.allclose(work_flow.calculate_stts_scores(frames), expected, rtol=0, atol=1e-9, equal_nan=True)
+
+
+def test_lookback(monkeypatch):
+    strategies = work_flow.enabled_strategies()
+    assert work_flow.lookback(strategies) == max(
+        [work_flow.MACD_WARMUP] + [strategy_func.lookback for strategy_func in strategies.values()])
+    assert work_flow.lookback({'海龟交易法则': turtle_trade.check_enter}) == work_flow.MACD_WARMUP
+    # 没有声明lookback的策略需要全部历史
+    assert work_flow.lookback({'自定义': lambda code_name, data, end_date=None: False}) is None
@@ -1,13 +1,22 @@
+import glob
+import argparse
+
+import numpy as np
 import pandas as pd
-import akshare as ak
+import data_fetcher
+import gateway
+import settings
 from datetime import datetime, timedelta
 
+# work_flow.save_latest_data_to_file保存的选股结果
+LATEST_DATA_FILES = 'output/*_latest_data_*.csv'
+
 print("所有模块导入成功")
 
 def is_trading_day(date):
     print(f"检查日期 {date.strftime('%Y-%m-%d')} 是否为交易日")
     try:
-        calendar = ak.tool_trade_date_hist_sina()
+        calendar = gateway.call('tool_trade_date_hist_sina')
         return date.strftime('%Y-%m-%d') in calendar['trade_date'].values
     except Exception as e:
         print(f"获取交易日历时出错: {e}")
@@ -34,7 +43,7 @@ def update_stock_data(file_path):
         
         try:
             print(f"尝试获取 {formatted_code} 的数据...")
-            stock_data = ak.stock_zh_a_daily(symbol=formatted_code, start_date=start_date, end_date=end_date)
+            stock_data = gateway.call('stock_zh_a_daily', symbol=formatted_code, start_date=start_date, end_date=end_date)
             
             if not stock_data.empty:
                 latest_data = stock_data.iloc[-1]
@@ -55,6 +64,13 @@ def update_stock_data(file_path):
         except Exception as e:
             print(f"获取 {formatted_code} 的数据时出错: {e}")
     
+    df = arrange_columns(df)
+    df.to_csv(file_path, index=False, encoding='utf-8-sig')
+    print(f"更新后的数据已保存到原文件: {file_path}")
+
+
+# 删除原来的'涨跌幅'列，把'最新涨跌幅'放在'最新价'之后
+def arrange_columns(df):
     # 如果 '涨跌幅' 列存在，删除它
     if '涨跌幅' in df.columns:
         df = df.drop('涨跌幅', axis=1)
@@ -66,12 +82,72 @@ def update_stock_data(file_path):
         price_index = columns.index('最新价')
         columns.insert(price_index + 1, '最新涨跌幅')
         df = df[columns]
-    
-    df.to_csv(file_path, index=False, encoding='utf-8-sig')
-    print(f"更新后的数据已保存到原文件: {file_path}")
+    return df
+
+
+# 全市场最新价和涨跌幅，来自一次实时快照：DataFrame(代码, 最新价, 最新涨跌幅)
+def snapshot_prices():
+    snapshot = gateway.call('stock_zh_a_spot_em')
+    return pd.DataFrame({'代码': snapshot['代码'].astype(str), '最新价': snapshot['最新价'],
+                         '最新涨跌幅': snapshot['涨跌幅']})
+
+
+# 来自本地历史数据的最后两根K线，不访问网络；只有一根K线时涨跌幅为0
+def history_prices(codes):
+    panel = data_fetcher.load([(code, code) for code in codes])
+    close = panel.tail('收盘', 2)
+    with np.errstate(invalid='ignore'):
+        change = np.where(np.isnan(close[:, 0]), 0, (close[:, 1] - close[:, 0]) / close[:, 0] * 100)
+    return pd.DataFrame({'代码': [symbol[0] for symbol in panel.symbols], '最新价': close[:, 1],
+                         '最新涨跌幅': change})
+
+
+# 股票代码列中的6位代码（保存时可能是(代码, 名称)的字符串）
+def stock_codes(df):
+    return df['股票代码'].astype(str).str.extract(r'(\d{6})', expand=False)
+
+
+# 按股票代码一次合并最新价和涨跌幅，没有行情的股票保留原值
+def refresh(df, prices):
+    latest = prices.drop_duplicates('代码').set_index('代码').reindex(stock_codes(df))
+    found = latest['最新价'].notna().to_numpy()
+    df = df.copy()
+    for column in ('最新价', '最新涨跌幅'):
+        values = df[column].to_numpy(dtype=np.float64) if column in df.columns else np.full(len(df), np.nan)
+        df[column] = np.where(found, latest[column].to_numpy(dtype=np.float64).round(2), values)
+    return arrange_columns(df)
+
+
+# 批量更新：读取全部选股结果文件，一次合并最新行情后分别写回。source为'snapshot'（一次全市场快照）或'history'（本地历史数据）
+def update_all(files=None, source='snapshot'):
+    files = sorted(glob.glob(LATEST_DATA_FILES)) if files is None else list(files)
+    frames = [pd.read_csv(file_path, parse_dates=['日期']) for file_path in files]
+    if not frames:
+        print("没有需要更新的文件")
+        return
+    combined = pd.concat(frames, keys=range(len(frames)), names=['文件', None])
+    prices = snapshot_prices() if source == 'snapshot' else history_prices(sorted(set(stock_codes(combined).dropna())))
+    combined = refresh(combined, prices)
+    for k, (file_path, df) in enumerate(zip(files, frames)):
+        columns = arrange_columns(df.assign(最新价=0, 最新涨跌幅=0)).columns
+        combined.loc[k, columns].to_csv(file_path, index=False, encoding='utf-8-sig')
+        print(f"更新后的数据已保存到原文件: {file_path}")
+
 
 if __name__ == "__main__":
     print("准备执行主程序")
-    file_path = 'output/均线多头_latest_data_2024-09-04.csv'
-    update_stock_data(file_path)
+    parser = argparse.ArgumentParser(description='更新选股结果文件中的最新价和最新涨跌幅')
+    parser.add_argument('files', nargs='*', help='选股结果文件，默认为{}'.format(LATEST_DATA_FILES))
+    parser.add_argument('--source', choices=['snapshot', 'history', 'daily'], default='snapshot',
+                        help='snapshot：一次全市场快照；history：本地历史数据；daily：逐只股票请求日线')
+    args = parser.parse_args()
+    settings.load_config(required=False)
+    if args.source == 'daily':
+        for file_path in args.files or sorted(glob.glob(LATEST_DATA_FILES)):
+            update_stock_data(file_path)
+    else:
+        try:
+            update_all(args.files or None, args.source)
+        except data_fetcher.HistoryDisabled as error:
+            parser.error(str(error))
     print("程序执行完毕")
@@ -1,7 +1,27 @@
 # -*- coding: UTF-8 -*-
 import datetime
 
+# 按交易日排序的整数日期索引（如20240102）的名称
+DATE_INDEX = '交易日'
+
 
 # 是否是工作日
 def is_weekday():
-    return datetime.datetime.today().weekday() < 5
\ No newline at end of file
+    return datetime.datetime.today().weekday() < 5
+
+
+# 日期转为整数，如'2024-01-02' -> 20240102
+def date_int(value):
+    return int(str(value)[:10].replace('-', ''))
+
+
+# 截取end_date（含）之前的数据：在有序的日期上二分查找，返回切片视图，不复制数据
+# 有整数日期索引（MarketPanel.frame）时按索引查找，否则按'日期'列查找
+def as_of(data, end_date):
+    if end_date is None:
+        return data
+    if data.index.name == DATE_INDEX:
+        end = data.index.searchsorted(date_int(end_date), side='right')
+    else:
+        end = data['日期'].searchsorted(str(end_date)[:10], side='right')
+    return data.iloc[:end]
@@ -0,0 +1,129 @@
+# -*- encoding: UTF-8 -*-
+
+import os
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import data_fetcher
+import history_store
+import settings
+import utils
+import work_flow
+
+# 持有的K线数
+HORIZONS = (1, 3, 5, 10, 20)
+
+
+# 面板中[start_date, end_date]区间内的交易日
+def trading_dates(panel, start_date=None, end_date=None):
+    begin = 0 if start_date is None else np.searchsorted(panel.dates, np.datetime64(str(start_date)[:10], 'D'))
+    end = len(panel.dates) if end_date is None else \
+        np.searchsorted(panel.dates, np.datetime64(str(end_date)[:10], 'D'), side='right')
+    return list(panel.date_strings[begin:end])
+
+
+# 策略在每个交易日的选股结果（股票数 × 交易日数），params为策略参数。
+# 策略提供signal_matrix时一次计算全部交易日，cache中的中间结果可以在多次调用之间共享；
+# 有向量化版本的策略每天一次计算全市场；否则每只股票只生成一次DataFrame视图，再按日期截取
+def signals(panel, strategy_func, dates, cache=None, **params):
+    signal_matrix = getattr(strategy_func, 'signal_matrix', None)
+    if signal_matrix is not None:
+        return signal_matrix(panel, dates, cache=cache, **params)
+
+    matrix = np.zeros((len(panel), len(dates)), dtype=bool)
+    kernel = getattr(strategy_func, 'vectorized', None)
+    if kernel is not None:
+        for j, date in enumerate(dates):
+            matrix[:, j] = kernel(panel, end_date=date, **params)
+        return matrix
+
+    for i, (symbol, data) in enumerate(panel.items()):
+        for j, date in enumerate(dates):
+            if utils.as_of(data, date).empty:  # 该股票在date时还未上市
+                continue
+            matrix[i, j] = bool(strategy_func(symbol, data, end_date=date, **params))
+    return matrix
+
+
+# 在每个交易日收盘买入、持有horizon根K线后收盘卖出的收益率（股票数 × 交易日数）；当日停牌或之后K线不足时为NaN
+def forward_returns(panel, dates, horizon):
+    columns = np.searchsorted(panel.dates, np.asarray(dates, dtype='datetime64[D]'))
+    # 当日K线是该股票的第几根
+    bars = np.cumsum(panel.valid, axis=1)[:, columns] - 1
+    exits = bars + horizon
+    tradable = panel.valid[:, columns] & (exits < panel.counts[:, None])
+
+    last = panel.values.shape[1] - 1
+    entry_columns = np.take_along_axis(panel.positions, np.clip(bars, 0, last), axis=1)
+    exit_columns = np.take_along_axis(panel.positions, np.clip(exits, 0, last), axis=1)
+    rows = np.arange(len(panel))[:, None]
+    close = panel['收盘'].astype(np.float64)
+    result = close[rows, exit_columns] / close[rows, entry_columns] - 1
+    result[~tradable] = np.nan
+    return result
+
+
+# 逐日回测：每个策略每天的选股及其之后各持有期的收益率，每行一次选股
+def run(panel, strategies, start_date=None, end_date=None, horizons=HORIZONS):
+    dates = trading_dates(panel, start_date, end_date)
+    returns = {horizon: forward_returns(panel, dates, horizon) for horizon in horizons}
+
+    picks = []
+    for strategy, strategy_func in strategies.items():
+        rows, columns = np.nonzero(signals(panel, strategy_func, dates))
+        frame = pd.DataFrame({
+            '策略': strategy,
+            '日期': np.asarray(dates, dtype=object)[columns],
+            '代码': [panel.symbols[i][0] for i in rows],
+            '名称': [panel.symbols[i][1] for i in rows],
+        })
+        for horizon in horizons:
+            frame['{}日收益率'.format(horizon)] = returns[horizon][rows, columns]
+        picks.append(frame)
+    if not picks:
+        return pd.DataFrame(columns=['策略', '日期', '代码', '名称'])
+    return pd.concat(picks, ignore_index=True).sort_values(['策略', '日期', '代码'], ignore_index=True)
+
+
+# 按策略汇总：选股次数，各持有期的平均收益率和胜率
+def summary(picks, horizons=HORIZONS):
+    columns = {}
+    grouped = picks.groupby('策略', sort=False)
+    columns['选股次数'] = grouped.size()
+    for horizon in horizons:
+        column = '{}日收益率'.format(horizon)
+        columns['{}日平均收益率'.format(horizon)] = grouped[column].mean()
+        columns['{}日胜率'.format(horizon)] = grouped[column].apply(lambda r: (r.dropna() > 0).mean())
+    return pd.DataFrame(columns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='在本地历史数据上逐日回测策略')
+    parser.add_argument('start_date', help='开始日期，例如：2024-01-02')
+    parser.add_argument('end_date', nargs='?', help='结束日期，默认为最后一个交易日')
+    parser.add_argument('--strategy', action='append', help='策略名称，可多次指定，默认为全部启用的策略')
+    parser.add_argument('--output', default='output', help='选股明细的保存目录')
+    args = parser.parse_args()
+
+    settings.init()
+    try:
+        panel = data_fetcher.load([(code, code) for code in history_store.codes()])
+    except data_fetcher.HistoryDisabled as error:
+        parser.error(str(error))
+    strategies = work_flow.enabled_strategies()
+    if args.strategy:
+        strategies = {name: strategies[name] for name in args.strategy}
+
+    picks = run(panel, strategies, args.start_date, args.end_date)
+    print(summary(picks).to_string())
+
+    os.makedirs(args.output, exist_ok=True)
+    file_path = os.path.join(args.output, 'walk_forward_{}_{}.csv'.format(args.start_date, args.end_date or 'latest'))
+    picks.to_csv(file_path, index=False, encoding='utf-8-sig')
+    print("选股明细已保存到文件：{}".format(file_path))
+
+
+if __name__ == "__main__":
+    main()
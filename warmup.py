@@ -0,0 +1,95 @@
+# -*- encoding: UTF-8 -*-
+
+import datetime
+import logging
+import threading
+
+import settings
+
+# 收盘前预热：交易时段内（warm_time）在后台线程导入策略、获取全市场截至前一交易日的历史数据和龙虎榜名单；
+# 收盘后（close_time）只获取一次收盘快照，作为当日K线合并到预热好的面板上执行策略，不再重新下载历史数据。
+# pandas、akshare、策略等在预热线程中才导入，定时任务启动时不需要等待
+DEFAULTS = {
+    'enable': False,
+    'warm_time': '14:30',   # 开始预热
+    'close_time': '15:01',  # 获取收盘快照并执行策略
+}
+
+
+def options():
+    config = getattr(settings, 'config', None)
+    warmup = config.get('warmup') if isinstance(config, dict) else None
+    return {**DEFAULTS, **(warmup or {})}
+
+
+class Warmup:
+    def __init__(self, strategies=None, date=None):
+        self.strategies = strategies
+        self.date = datetime.date.fromisoformat(str(date)[:10]) if date else datetime.date.today()
+        self.scanner = None
+        self.thread = None
+
+    # 在后台线程中预热
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name='warmup', daemon=True)
+        self.thread.start()
+        return self
+
+    def run(self):
+        try:
+            self.prepare()
+        except Exception:
+            logging.exception("收盘前预热失败，收盘后将完整执行一次选股")
+
+    # 按快照中的股票获取截至前一日的历史数据，生成当日K线待写入的面板
+    def prepare(self, snapshot=None):
+        import data_fetcher
+        import gateway
+        import live_scan
+        import work_flow
+
+        started = datetime.datetime.now()
+        strategies = self.strategies or work_flow.enabled_strategies()
+        if snapshot is None:
+            snapshot = gateway.call('stock_zh_a_spot_em', refresh=True)
+        stocks = [tuple(x) for x in snapshot[['代码', '名称']].values]
+        previous = (self.date - datetime.timedelta(days=1)).strftime('%Y%m%d')
+        panel = data_fetcher.run(stocks, work_flow.lookback(strategies), end_date=previous)
+        if any(getattr(strategy_func, 'uses_top_list', False) for strategy_func in strategies.values()):
+            settings.load_top_list()
+
+        self.strategies = strategies
+        self.scanner = live_scan.LiveScan(panel, strategies, self.date)
+        logging.info("收盘前预热完成：{}只股票，耗时{:.1f}秒".format(
+            len(panel), (datetime.datetime.now() - started).total_seconds()))
+        return self.scanner
+
+    # 收盘后：等待预热完成，写入收盘快照，对通过快照预筛的股票执行策略，保存并推送结果。
+    # 预热没有完成时完整执行一次选股
+    def finish(self, snapshot=None):
+        if self.thread is not None:
+            self.thread.join()
+        import gateway
+        import indicator_cache
+        import work_flow
+
+        if self.scanner is None:
+            work_flow.prepare()
+            return None
+
+        logging.info("************************ process start ***************************************")
+        if snapshot is None:
+            snapshot = gateway.call('stock_zh_a_spot_em', refresh=True)
+        work_flow.statistics(snapshot, None)
+        self.scanner.merge(snapshot)
+
+        candidates = set(work_flow.pushdown(snapshot, self.strategies)['代码'])
+        indices = [i for i, code in enumerate(self.scanner.codes) if code in candidates]
+        logging.info("快照预筛后需要执行策略的股票数：{}/{}".format(len(indices), len(snapshot)))
+        indicator_cache.clear()
+        hits = work_flow.evaluate(self.scanner.panel, self.strategies, settings.config['end_date'], indices)
+        for strategy, results in hits.items():
+            work_flow.report(strategy, results)
+        indicator_cache.clear()
+        logging.info("************************ process   end ***************************************")
+        return hits
@@ -2,7 +2,12 @@
 
 import os
 import data_fetcher
+import gateway
+import indicator_cache
+import parallel_eval
 import settings
+import utils
+from market_panel import MarketPanel
 import strategy.enter as enter
 from strategy import turtle_trade, climax_limitdown
 from strategy import backtrace_ma250
@@ -12,21 +17,33 @@ from strategy import low_backtrace_increase
 from strategy import keep_increasing
 from strategy import high_tight_flag
 from strategy import chandelier_exit
-import akshare as ak
 import push
 import logging
-import time
 import datetime
+import numpy as np
 import pandas as pd
 import ast
 
 def prepare():
     logging.info("************************ process start ***************************************")
-    all_data = ak.stock_zh_a_spot_em()
+    all_data = gateway.call('stock_zh_a_spot_em')
     subset = all_data[['代码', '名称']]
     stocks = [tuple(x) for x in subset.values]
     statistics(all_data, stocks)
 
+    strategies = enabled_strategies()
+
+    subset = pushdown(all_data, strategies)[['代码', '名称']]
+    stocks = [tuple(x) for x in subset.values]
+    logging.info("快照预筛后需要获取历史数据的股票数：{}/{}".format(len(stocks), len(all_data)))
+
+    process(stocks, strategies)
+
+
+    logging.info("************************ process   end ***************************************")
+
+# 启用的策略
+def enabled_strategies():
     strategies = {
         '放量上涨': enter.check_volume,
         '均线多头': keep_increasing.check,
@@ -42,40 +59,55 @@ def prepare():
 
     if datetime.datetime.now().weekday() == 0:
         strategies['均线多头'] = keep_increasing.check
+    return strategies
 
-    process(stocks, strategies)
 
+# 启用的策略需要的K线数：各策略声明的lookback与STTS评分的MACD预热取最大值；有策略没有声明时返回None，获取全部历史
+def lookback(strategies):
+    windows = [getattr(strategy_func, 'lookback', None) for strategy_func in strategies.values()]
+    if None in windows:
+        return None
+    return max(windows + [MACD_WARMUP])
 
-    logging.info("************************ process   end ***************************************")
 
 def process(stocks, strategies):
-    stocks_data = data_fetcher.run(stocks)
-    for strategy, strategy_func in strategies.items():
-        check(stocks_data, strategy, strategy_func)
-        time.sleep(2)
+    stocks_data = data_fetcher.run(stocks, lookback(strategies))
+    indicator_cache.clear()
+    workers = settings.config.get('workers') or 0
+    if workers > 1 and isinstance(stocks_data, MarketPanel):
+        hits, scores = parallel_eval.evaluate(stocks_data, strategies, settings.config['end_date'], workers)
+    else:
+        hits, scores = evaluate(stocks_data, strategies, settings.config['end_date']), {}
+    for strategy, results in hits.items():
+        report(strategy, results, scores.get(strategy))
+    indicator_cache.clear()
 
 def check(stocks_data, strategy, strategy_func):
     end = settings.config['end_date']
-    m_filter = check_enter(end_date=end, strategy_fun=strategy_func)
-    results = dict(filter(m_filter, stocks_data.items()))
-    
+    results = screen(stocks_data, strategy_func, end)
+    report(strategy, results)
+
+# 对策略初步筛选出的股票计算STTS评分，保存并推送适合短线交易的股票
+# scores为多进程执行时子进程已经算好的STTS评分
+def report(strategy, results, scores=None):
     if len(results) > 0:
         suitable_stocks = []
         latest_data = []  # 用于存储所有符合条件的股票的最新一条数据
         
+        if scores is None:
+            # 一次计算该策略全部候选股票的STTS评分
+            scores = dict(zip(results, calculate_stts_scores(list(results.values()))))
+
         for stock_code, df in results.items():
-            # 计算技术指标
-            df = calculate_technical_indicators(df)
-            
-            # 计算STTS评分
-            stts_score = calculate_advanced_stts_score(df)
+            stts_score = scores[stock_code]
             
             # 设定一个阈值，例如1.5，超过这个分数认为适合短线交易
             if stts_score > 1.5:
+                df = calculate_technical_indicators(df, stock_code)
                 latest_row = df.iloc[-1].copy()
                 
                 # 添加换手率、涨跌幅和收盘价的过滤条件
-                if 3 <= latest_row['换手率'] <= 15 and -3 <= latest_row['涨跌幅'] <= 7 and 5 <= latest_row['收盘'] <= 40:
+                if is_suitable(latest_row):
                     suitable_stocks.append(stock_code)
                     save_recent_20_days_data({(stock_code, ""): df},strategy)   
                     logging.info(f"股票代码 {stock_code} 适合短线交易，STTS分数: {stts_score}")
@@ -99,9 +131,6 @@ def check(stocks_data, strategy, strategy_func):
     else:
         logging.info(f"策略 '{strategy}' 没有筛选出符合初步条件的股票。")
 
-    # 防止请求过于频繁，适当增加延时
-    time.sleep(2)
-
 def save_latest_data_to_file(latest_data, strategy):
     """
     将符合条件的股票的最新行情数据保存到同一个CSV文件中。
@@ -122,10 +151,71 @@ def save_latest_data_to_file(latest_data, strategy):
     latest_df.to_csv(file_path, index=False, encoding='utf-8-sig')
     print(f"所有符合条件股票的最新行情数据已保存到文件：{file_path}")
 
+# 对最新一个交易日的过滤条件：换手率、涨跌幅和收盘价在指定范围内
+def is_suitable(latest_row):
+    return 3 <= latest_row['换手率'] <= 15 and -3 <= latest_row['涨跌幅'] <= 7 and 5 <= latest_row['收盘'] <= 40
+
+
+# is_suitable()在快照上的等价形式
+def latest_snapshot_filter(snapshot):
+    return snapshot['换手率'].between(3, 15) & snapshot['涨跌幅'].between(-3, 7) & snapshot['最新价'].between(5, 40)
+
+
+# 快照预筛：只保留至少能通过一个已启用策略快照条件、且满足最新行情过滤条件的股票
+# 未声明snapshot_filter的策略不做预筛；停牌（没有最新价）的股票全部保留；回测时快照与end_date不对应，不做预筛
+def pushdown(all_data, strategies):
+    if settings.config['end_date'] is not None:
+        return all_data
+
+    mask = pd.Series(False, index=all_data.index)
+    for strategy_func in strategies.values():
+        snapshot_filter = getattr(strategy_func, 'snapshot_filter', None)
+        if snapshot_filter is None:
+            mask[:] = True
+            break
+        mask |= snapshot_filter(all_data)
+
+    mask &= latest_snapshot_filter(all_data)
+    mask |= all_data['最新价'].isna()
+    return all_data.loc[mask]
+
+
+# 初步筛选：配置vectorized为true且策略提供了向量化版本时，一次计算全市场；否则逐只股票调用策略函数
+def screen(stocks_data, strategy_func, end_date=None):
+    return evaluate(stocks_data, {None: strategy_func}, end_date)[None]
+
+
+# 单次遍历全市场：每只股票只访问一次，依次执行所有启用的策略，按策略收集命中的股票
+# indices指定只计算面板中的部分股票（盘中扫描时只计算行情有变化的股票）
+def evaluate(stocks_data, strategies, end_date=None, indices=None):
+    hits = {strategy: {} for strategy in strategies}
+    per_symbol = {}
+    for strategy, strategy_func in strategies.items():
+        kernel = getattr(strategy_func, 'vectorized', None)
+        if settings.config.get('vectorized') and kernel is not None and isinstance(stocks_data, MarketPanel):
+            mask = kernel(stocks_data, end_date=end_date)
+            if indices is not None:
+                mask &= np.isin(np.arange(len(stocks_data)), indices)
+            hits[strategy] = {symbol: stocks_data.frame(i) for i, symbol in enumerate(stocks_data.symbols) if mask[i]}
+        else:
+            per_symbol[strategy] = strategy_func
+
+    if per_symbol:
+        items = stocks_data.items() if indices is None else stocks_data.items(indices)
+        for symbol, data in items:
+            if end_date is not None and utils.as_of(data, end_date).empty:  # 该股票在end_date时还未上市
+                logging.debug("{}在{}时还未上市".format(symbol, end_date))
+                continue
+            for strategy, strategy_func in per_symbol.items():
+                if strategy_func(symbol, data, end_date=end_date):
+                    hits[strategy][symbol] = data
+    return hits
+
+
 def check_enter(end_date=None, strategy_fun=enter.check_volume):
     def end_date_filter(stock_data):
         if end_date is not None:
-            if end_date < stock_data[1].iloc[0].日期:  # 该股票在end_date时还未上市
+            if utils.as_of(stock_data[1], end_date).empty:  # 该股票在end_date时还未上市
                 logging.debug("{}在{}时还未上市".format(stock_data[0], end_date))
                 return False
         return strategy_fun(stock_data[0], stock_data[1], end_date=end_date)
@@ -173,38 +263,111 @@ def save_recent_20_days_data(results, strategy, output_dir="output"):
         print(f"Saved {stock_name} ({stock_code}) data to {file_path}")
 
 # 增加计算技术指标的函数
-def calculate_technical_indicators(df):
+def calculate_technical_indicators(df, code_name=None):
     # 计算 ATR（平均真实波幅）
     df['最高-最低'] = df['最高'] - df['最低']
     df['最高-前收盘'] = abs(df['最高'] - df['收盘'].shift(1))
     df['最低-前收盘'] = abs(df['最低'] - df['收盘'].shift(1))
-    df['真实波幅'] = df[['最高-最低', '最高-前收盘', '最低-前收盘']].max(axis=1)
-    df['ATR'] = df['真实波幅'].rolling(window=14).mean().round(2)
+    df['真实波幅'] = indicator_cache.get(code_name, df, 'TR')
+    df['ATR'] = indicator_cache.get(code_name, df, 'ATR', 14)
     
     # 计算 MACD（指标参数12, 26, 9）
-    df['EMA12'] = df['收盘'].ewm(span=12, adjust=False).mean().round(2)
-    df['EMA26'] = df['收盘'].ewm(span=26, adjust=False).mean().round(2)
-    df['MACD'] = (df['EMA12'] - df['EMA26']).round(2)
-    df['信号线'] = df['MACD'].ewm(span=9, adjust=False).mean().round(2)
-    df['MACD柱'] = (df['MACD'] - df['信号线']).round(2)
+    df['EMA12'], df['EMA26'], df['MACD'], df['信号线'], df['MACD柱'] = indicator_cache.get(code_name, df, 'MACD', 12, 26, 9)
     
     # 计算布林带（Bollinger Bands）
-    df['20日均线'] = df['收盘'].rolling(window=20).mean().round(2)
-    df['20日标准差'] = df['收盘'].rolling(window=20).std().round(2)
-    df['上轨'] = (df['20日均线'] + (df['20日标准差'] * 2)).round(2)
-    df['下轨'] = (df['20日均线'] - (df['20日标准差'] * 2)).round(2)
+    df['20日均线'], df['20日标准差'], df['上轨'], df['下轨'] = indicator_cache.get(code_name, df, 'BOLL', 20, 2)
     
     # 计算 RSI（相对强弱指数）
-    df['价格变化'] = df['收盘'].diff(1)
-    df['上涨'] = df['价格变化'].apply(lambda x: x if x > 0 else 0)
-    df['下跌'] = df['价格变化'].apply(lambda x: -x if x < 0 else 0)
-    df['平均上涨'] = df['上涨'].rolling(window=14).mean().round(2)
-    df['平均下跌'] = df['下跌'].rolling(window=14).mean().round(2)
-    df['相对强度'] = (df['平均上涨'] / df['平均下跌']).round(2)
-    df['RSI'] = (100 - (100 / (1 + df['相对强度']))).round(2)
+    df['价格变化'], df['上涨'], df['下跌'], df['平均上涨'], df['平均下跌'], df['相对强度'], df['RSI'] = \
+        indicator_cache.get(code_name, df, 'RSI', 14)
     
     return df
 
+# MACD的EMA为递归计算，批量评分只取最后MACD_WARMUP根K线，更早K线的权重不足(25/27)^250
+MACD_WARMUP = 250
+
+
+# 取每只股票最后n根K线的某个字段，右对齐成(股票数 × n)的矩阵，K线不足的部分为NaN
+def tail_values(frames, field, n):
+    values = [df[field].values[-n:] for df in frames]
+    result = np.full((len(frames), n), np.nan, dtype=np.result_type(np.float32, *values))
+    for i, value in enumerate(values):
+        result[i, n - len(value):] = value
+    return result
+
+
+# 与pandas的ewm(span=span, adjust=False).mean()逐步计算方式一致，沿最后一维递推
+def ewm_mean(values, span):
+    values = values.astype(np.float64)
+    alpha = 1. / (1. + (span - 1) / 2.)
+    old_wt = 1. - alpha
+    result = np.empty(values.shape)
+    weighted = values[:, 0]
+    result[:, 0] = weighted
+    for i in range(1, values.shape[1]):
+        cur = values[:, i]
+        updated = np.where(weighted != cur, (old_wt * weighted + alpha * cur) / (old_wt + alpha), weighted)
+        weighted = np.where(np.isnan(weighted), cur, np.where(np.isnan(cur), weighted, updated))
+        result[:, i] = weighted
+    return result
+
+
+# 对最后一维做窗口为window的滑动平均，窗口内有NaN时结果为NaN
+def window_mean(values, window):
+    return np.lib.stride_tricks.sliding_window_view(values.astype(np.float64), window, axis=-1).mean(axis=-1)
+
+
+# 批量计算STTS评分：与calculate_technical_indicators + calculate_advanced_stts_score的结果一致，
+# 但每项指标只计算最后一根K线需要的窗口，返回与frames顺序一致的评分数组
+def calculate_stts_scores(frames):
+    if len(frames) == 0:
+        return np.array([])
+
+    # 成交量/5日平均成交量
+    volume = tail_values(frames, '成交量', 5)
+    volume_score = np.round(volume[:, -1] / volume.astype(np.float64).mean(axis=1), 2)
+
+    amplitude_score = np.round(tail_values(frames, '振幅', 1)[:, 0].astype(np.float64) / 10, 2)
+    turnover_rate_score = np.round(tail_values(frames, '换手率', 1)[:, 0].astype(np.float64) / 5, 2)
+    price_change_score = np.round(tail_values(frames, '涨跌幅', 1)[:, 0].astype(np.float64) / 5, 2)
+
+    # ATR：最后14个ATR（14日真实波幅均值）需要27个真实波幅和再前一天的收盘价
+    close = tail_values(frames, '收盘', 28)
+    high = tail_values(frames, '最高', 27)
+    low = tail_values(frames, '最低', 27)
+    prev_close = close[:, :-1]
+    true_range = np.fmax(np.fmax(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
+    atr = np.round(window_mean(true_range, 14), 2)
+    atr_score = np.round(atr[:, -1] / atr.mean(axis=1), 2)
+
+    # MACD柱（12, 26, 9）
+    warmup = tail_values(frames, '收盘', MACD_WARMUP)
+    diff = np.round(np.round(ewm_mean(warmup, 12), 2) - np.round(ewm_mean(warmup, 26), 2), 2)
+    dea = np.round(ewm_mean(diff, 9), 2)
+    macd_score = np.round(diff[:, -1] - dea[:, -1], 2)
+
+    # 布林带宽度（20, 2）
+    last_close = close[:, -1]
+    window = close[:, -20:].astype(np.float64)
+    mid = np.round(window.mean(axis=1), 2)
+    std = np.round(window.std(axis=1, ddof=1), 2)
+    bollinger_band_width = np.round((np.round(mid + std * 2, 2) - np.round(mid - std * 2, 2)) / last_close, 2)
+
+    # RSI（14），第一根K线的涨跌记为0
+    change = np.diff(close[:, -15:], axis=1)
+    first = np.isnan(change) & ~np.isnan(close[:, -14:])
+    up = np.where(first, 0, np.clip(change, 0, None))
+    down = np.where(first, 0, np.clip(-change, 0, None))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        strength = np.round(np.round(up.astype(np.float64).mean(axis=1), 2) /
+                            np.round(down.astype(np.float64).mean(axis=1), 2), 2)
+        rsi = np.round(100 - (100 / (1 + strength)), 2)
+    rsi_score = np.round((70 - rsi) / 70, 2)
+
+    return np.round(amplitude_score + volume_score + turnover_rate_score + price_change_score +
+                    atr_score + macd_score + bollinger_band_width + rsi_score, 2)
+
+
 # 计算 STTS 分数的函数（中文名称，并保留两位小数）
 def calculate_advanced_stts_score(df):
     # 振幅/10